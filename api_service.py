@@ -1,23 +1,34 @@
 import os
-import json
+import re
+import hashlib
 import time
+import queue
+import atexit
 import asyncio
-from typing import AsyncGenerator
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
+import orjson
 import signal
 import sys
+from dotenv import load_dotenv
 
 from config import Config
-from llm_client import LLMClient
-from embedding_client import EmbeddingClient
+from llm_client import LLMClient, llm_cancel_event
+from embedding_client import get_embedding_client
 from retriever import PaperRetriever
-from pdf_parser import PDFParser
+from pdf_parser import PDFParser, extract_pdf_text, MAX_PARSE_TEXT_CHARS
 from paper_analyzer import PaperAnalyzer
 from reviewer import Reviewer
-from prompt_template import detect_language
+from review_cache import ReviewCache, StageCache
+from prompt_template import detect_language, cached_detect_language
 
 
 def load_env_file(env_file: str):
@@ -28,15 +39,9 @@ def load_env_file(env_file: str):
     
     if os.path.exists(env_file):
         print(f"✓ 找到 .env 文件: {env_file}")
-        loaded_count = 0
-        with open(env_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value.strip('"\'')
-                    loaded_count += 1
-        print(f"✓ 成功加载 {loaded_count} 个环境变量")
+        # 使用python-dotenv解析（支持export前缀、引号转义、多行值），已存在的环境变量优先
+        load_dotenv(env_file, override=False, encoding='utf-8')
+        print(f"✓ 成功加载 .env 文件")
         return True
     else:
         print(f"⚠️ 警告: 未找到 .env 文件: {env_file}")
@@ -46,390 +51,693 @@ def load_env_file(env_file: str):
 # 加载环境变量
 load_env_file(".env")
 
+# 日志：记录先进入队列，由后台线程写出，stderr写入不阻塞事件循环
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(), respect_handler_level=True)
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# CPU密集型辅助函数使用的进程池（首次使用时创建，避免在导入/子进程中提前启动worker）
+_PROC_POOL = None
+
+# 短文本在事件循环内直接计算即可，进程间传参的开销反而更大
+_CPU_OFFLOAD_MIN_CHARS = 20000
+
+
+def _get_proc_pool() -> ProcessPoolExecutor:
+    """获取（必要时创建）进程池"""
+    global _PROC_POOL
+    if _PROC_POOL is None:
+        _PROC_POOL = ProcessPoolExecutor(max_workers=Config.PROCESS_POOL_WORKERS)
+    return _PROC_POOL
+
+
+async def detect_language_async(text: str) -> str:
+    """检测语言：长文本放到进程池执行，避免正则扫描在GIL下阻塞事件循环"""
+    if not text or len(text) < _CPU_OFFLOAD_MIN_CHARS:
+        return cached_detect_language(text)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_proc_pool(), detect_language, text)
+    except Exception as e:
+        logger.warning("⚠️  进程池执行失败，改为线程执行: %s", e)
+        return await asyncio.to_thread(detect_language, text)
+
+
+async def extract_pdf_text_async(pdf_bytes: bytes, max_chars: Optional[int] = None) -> str:
+    """提取PDF文本：放到进程池执行，纯Python的页面解析不与事件循环及其他请求争抢GIL"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_proc_pool(), extract_pdf_text, pdf_bytes, max_chars)
+    except ValueError:
+        # 提取本身失败（内容过少、文件损坏），不必换线程重试
+        raise
+    except Exception as e:
+        logger.warning("⚠️  进程池执行失败，改为线程执行: %s", e)
+        return await asyncio.to_thread(extract_pdf_text, pdf_bytes, max_chars)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：配置默认线程池、创建共享客户端，退出时关闭进程池"""
+    global _PROC_POOL
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=Config.THREAD_POOL_WORKERS)
+    )
+    
+    # 客户端在启动时创建一次并在所有请求间复用，配置错误时直接启动失败
+    try:
+        app.state.llm_client = LLMClient()
+    except Exception as e:
+        raise RuntimeError(f"LLM客户端初始化失败: {e}") from e
+    try:
+        app.state.embedding_client = get_embedding_client()
+    except Exception as e:
+        raise RuntimeError(f"Embedding客户端初始化失败: {e}") from e
+    try:
+        app.state.retriever = PaperRetriever(app.state.embedding_client)
+    except Exception as e:
+        raise RuntimeError(f"论文检索器初始化失败: {e}") from e
+    
+    # 解析器、分析器和评阅器只持有上述共享客户端、不保存请求状态，同样在启动时创建一次
+    app.state.pdf_parser = PDFParser(app.state.llm_client)
+    app.state.paper_analyzer = PaperAnalyzer(app.state.llm_client, app.state.embedding_client, app.state.retriever)
+    app.state.reviewer = Reviewer(app.state.llm_client)
+    
+    yield
+    await app.state.llm_client.aclose()
+    if _PROC_POOL is not None:
+        _PROC_POOL.shutdown(wait=False, cancel_futures=True)
+        _PROC_POOL = None
+
 # 创建FastAPI应用
 app = FastAPI(
     title="ICAIS2025-PaperReview API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 @app.middleware("http")
 async def simple_log_middleware(request, call_next):
     """简化的日志中间件"""
     start_time = time.time()
+    # 时间戳只在入口格式化一次，耗时超过1秒时出口再重新取
+    ts = time.strftime('%H:%M:%S')
     path = request.url.path
+    is_health = path.startswith("/health")
     
-    if not path.startswith("/health"):
-        print(f"📥 [{time.strftime('%H:%M:%S')}] {request.method} {path}")
+    if not is_health:
+        logger.info("📥 [%s] %s %s", ts, request.method, path)
     
     try:
         response = await call_next(request)
         process_time = time.time() - start_time
-        if not path.startswith("/health"):
-            print(f"📤 [{time.strftime('%H:%M:%S')}] {request.method} {path} - {response.status_code} ({process_time:.3f}s)")
+        if not is_health:
+            if process_time > 1.0:
+                ts = time.strftime('%H:%M:%S')
+            logger.info("📤 [%s] %s %s - %s (%.3fs)", ts, request.method, path, response.status_code, process_time)
         return response
     except Exception as e:
-        print(f"❌ [{time.strftime('%H:%M:%S')}] 错误: {request.method} {path} - {e}")
+        logger.error("❌ [%s] 错误: %s %s - %s", time.strftime('%H:%M:%S'), request.method, path, e)
         raise
 
-# 配置CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["*"],
-)
+# 配置CORS：允许的来源固定，直接在ASGI层按字节比较origin头，免去通用CORSMiddleware的匹配开销
+_CORS_ALLOWED_ORIGINS = frozenset({b"http://localhost:3000", b"http://127.0.0.1:3000"})
+_CORS_ALLOW_METHODS = b"GET, POST, OPTIONS"
+_CORS_MAX_AGE = b"600"
+
+
+class FastCORS:
+    """静态来源白名单的CORS中间件（ASGI）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        # 非跨域请求直接放行
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed = origin in _CORS_ALLOWED_ORIGINS
+
+        # 预检请求：直接应答，不进入应用
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            if allowed and request_method.upper() in (b"GET", b"POST", b"OPTIONS"):
+                status, body = 200, b"OK"
+                headers = [
+                    (b"access-control-allow-origin", origin),
+                    (b"access-control-allow-credentials", b"true"),
+                    (b"access-control-allow-methods", _CORS_ALLOW_METHODS),
+                    (b"access-control-max-age", _CORS_MAX_AGE),
+                    (b"vary", b"Origin"),
+                ]
+                if request_headers:
+                    headers.append((b"access-control-allow-headers", request_headers))
+            else:
+                status, body = 400, b"Disallowed CORS request"
+                headers = []
+            headers += [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", str(len(body)).encode())]
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # 来源不在白名单中：不添加CORS头，由浏览器拦截
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in (b"access-control-allow-origin", b"access-control-allow-credentials")
+                ]
+                headers += [
+                    (b"access-control-allow-origin", origin),
+                    (b"access-control-allow-credentials", b"true"),
+                    (b"vary", b"Origin"),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+app.add_middleware(FastCORS)
 
 # 设置全局超时
 REQUEST_TIMEOUT = Config.REVIEW_TIMEOUT  # 20分钟总超时
 
+# 限制同时执行的评阅数量，超出时直接返回429，避免内存占用过高和LLM服务限流
+_REVIEW_SEMAPHORE = asyncio.Semaphore(Config.MAX_CONCURRENT_REVIEWS)
+
+# 进行中的评阅：请求键 -> 共享的评阅流；相同论文的并发请求合并为一次计算
+_INFLIGHT_REVIEWS = {}
+
+# 评阅结果缓存：重复提交（精确或近似相同的论文）直接返回已生成的评阅报告
+review_cache = ReviewCache(
+    ttl=Config.REVIEW_CACHE_TTL,
+    max_entries=Config.REVIEW_CACHE_MAX_ENTRIES,
+    similarity_threshold=Config.REVIEW_CACHE_SIMILARITY_THRESHOLD
+)
+
+# 阶段结果缓存：相同PDF跳过结构化解析与关键词提取（两次推理模型调用），并落盘供多进程复用
+stage_cache = StageCache(
+    cache_dir=Config.STAGE_CACHE_DIR,
+    max_entries=Config.STAGE_CACHE_MAX_ENTRIES,
+    ttl=Config.STAGE_CACHE_TTL,
+    max_files=Config.STAGE_CACHE_MAX_FILES
+)
+
 
 class PaperReviewRequest(BaseModel):
     query: str
     pdf_content: str
 
 
-def format_sse_data(content: str) -> str:
-    """生成OpenAI格式的SSE数据
+# 消息模板（按语言区分），带参数的模板在调用处使用 str.format 填充
+_MSG_TEMPLATES_ZH = {
+    'step1': "### 📄 步骤 1/6: PDF解析与结构化提取\n\n✅ 已完成\n\n",
+    'step2': "### 🔑 步骤 2/6: 关键信息提取\n\n✅ 已完成\n\n",
+    'step3': "### 📚 步骤 3/6: 相关论文检索\n\n✅ 已检索到 {n} 篇相关论文\n\n",
+    'step3_skip_degraded': "### 📚 步骤 3/6: 相关论文检索\n\n⚠️ 由于PDF解析信息不足，跳过外部论文检索，后续分析仅基于上传论文内容。\n\n",
+    'step3_skip_no_query': "### 📚 步骤 3/6: 相关论文检索\n\n⚠️ 无法生成有效查询，跳过外部论文检索。\n\n",
+    'step4': "### 💡 步骤 4/6: 语义分析与创新点识别\n\n✅ 已完成\n\n",
+    'step5': "### ⭐ 步骤 5/6: 多维度深度评估\n\n✅ 已完成\n\n",
+    'step6': "### 📋 步骤 6/6: 生成评阅报告\n\n",
+    'review_progress': "🔄 正在生成评阅报告，请稍候...\n\n",
+    'error_config': "## ❌ 错误\n\n配置验证失败，请检查环境变量设置\n\n",
+    'error_config_exception': "## ❌ 错误\n\n配置验证异常: {e}\n\n",
+    'error_pdf_parse': "## ❌ 错误\n\nPDF解析失败，无法继续: {e}\n\n",
+    'error_pdf_no_text': "## ❌ 错误\n\nPDF解析失败，无法继续\n\n",
+    'error_key_extraction': "## ❌ 错误\n\n关键信息提取失败\n\n",
+    'error_retrieval': "## ❌ 错误\n\n论文检索失败: {e}\n\n",
+    'error_analysis': "## ❌ 错误\n\n分析失败: {e}\n\n",
+    'error_review': "## ❌ 错误\n\n评阅报告生成失败: {e}\n\n",
+    'error_timeout': "## ❌ 超时错误\n\n请求处理超过 {t} 秒，已自动终止\n\n",
+    'error_general': "## ❌ 错误\n\n程序执行失败: {e}\n\n",
+    'pdf_timeout': "⚠️ PDF解析超时，使用备用方法提取基本信息\n\n",
+    'key_extraction_timeout': "⚠️ 关键信息提取超时，使用备用方法\n\n",
+    'pdf_fallback': "基本信息提取完成\n\n",
+    'pdf_warning': "⚠️ PDF解析警告: {e}\n\n",
+    'review_empty': "⚠️ 评阅报告生成失败，返回空内容\n\n",
+    'error_review_timeout': "## ❌ 错误\n\n评阅报告生成超时\n\n",
+    'analysis_timeout': "语义分析阶段超时，使用论文自身信息进行基本创新点总结。",
+    'innovation_timeout': "创新点分析超时，仅依据论文自身内容进行基本总结。",
+    'innovation_failed': "创新点分析出错: {e}"
+}
+
+_MSG_TEMPLATES_EN = {
+    'step1': "### 📄 Step 1/6: PDF Parsing and Structure Extraction\n\n✅ Completed\n\n",
+    'step2': "### 🔑 Step 2/6: Key Information Extraction\n\n✅ Completed\n\n",
+    'step3': "### 📚 Step 3/6: Related Paper Retrieval\n\n✅ Retrieved {n} related papers\n\n",
+    'step3_skip_degraded': "### 📚 Step 3/6: Related Paper Retrieval\n\n⚠️ Skipped because the parsed PDF lacks reliable structure; subsequent analysis relies solely on the uploaded manuscript.\n\n",
+    'step3_skip_no_query': "### 📚 Step 3/6: Related Paper Retrieval\n\n⚠️ Skipped because no valid query could be generated from the PDF content.\n\n",
+    'step4': "### 💡 Step 4/6: Semantic Analysis and Innovation Identification\n\n✅ Completed\n\n",
+    'step5': "### ⭐ Step 5/6: Multi-dimensional Deep Evaluation\n\n✅ Completed\n\n",
+    'step6': "### 📋 Step 6/6: Review Report Generation\n\n",
+    'review_progress': "🔄 Generating review report, please wait...\n\n",
+    'error_config': "## ❌ Error\n\nConfiguration validation failed. Please check environment variables.\n\n",
+    'error_config_exception': "## ❌ Error\n\nConfiguration validation exception: {e}\n\n",
+    'error_pdf_parse': "## ❌ Error\n\nPDF parsing failed. Cannot continue: {e}\n\n",
+    'error_pdf_no_text': "## ❌ Error\n\nPDF parsing failed. Cannot continue.\n\n",
+    'error_key_extraction': "## ❌ Error\n\nKey information extraction failed.\n\n",
+    'error_retrieval': "## ❌ Error\n\nPaper retrieval failed: {e}\n\n",
+    'error_analysis': "## ❌ Error\n\nAnalysis failed: {e}\n\n",
+    'error_review': "## ❌ Error\n\nReview report generation failed: {e}\n\n",
+    'error_timeout': "## ❌ Timeout Error\n\nRequest processing exceeded {t} seconds. Automatically terminated.\n\n",
+    'error_general': "## ❌ Error\n\nProcess execution failed: {e}\n\n",
+    'pdf_timeout': "⚠️ PDF parsing timeout, using fallback method to extract basic information\n\n",
+    'key_extraction_timeout': "⚠️ Key information extraction timeout, using fallback method\n\n",
+    'pdf_fallback': "Basic information extraction completed\n\n",
+    'pdf_warning': "⚠️ PDF parsing warning: {e}\n\n",
+    'review_empty': "⚠️ Review report generation failed, returned empty content\n\n",
+    'error_review_timeout': "## ❌ Error\n\nReview report generation timeout\n\n",
+    'analysis_timeout': "Semantic analysis timed out. Falling back to a basic innovation summary based on the paper content only.",
+    'innovation_timeout': "Innovation analysis timeout; only a basic summary based on the manuscript itself is available.",
+    'innovation_failed': "Innovation analysis error: {e}"
+}
+
+
+# 备用标题提取：去除首尾空白后长度在11-199字符之间的行（标题通常在10-200字符之间）
+_TITLE_RE = re.compile(r'(?m)^[ \t]*(\S[^\n]{9,197}\S)[ \t]*$')
+
+# 标题只在文本开头查找，避免扫描整篇论文
+_TITLE_SCAN_CHARS = 2000
+
+# 备用方法保留的原始文本长度（与PDFParser.parse保留的raw_text一致）
+_FALLBACK_TEXT_CHARS = 10000
+
+# ping注释帧的分隔符，与数据帧 "data: ...\n\n" 的格式保持一致
+SSE_SEP = "\n"
+
+# EventSourceResponse自动发送ping注释的间隔（秒），替代手动心跳
+SSE_PING_INTERVAL = 15
+
+# SSE结束标记帧（固定内容，预先编码）
+SSE_DONE_FRAME = b"data: [DONE]\n\n"
+
+# OpenAI格式数据帧的固定前后缀（预先编码），中间填入JSON转义后的content
+SSE_DATA_PREFIX = b'data: {"object":"chat.completion.chunk","choices":[{"delta":{"content":'
+SSE_DATA_SUFFIX = b'}}]}\n\n'
+
+
+# 流式输出正文时每个SSE帧携带的字符数
+STREAM_CHUNK_SIZE = 512
+
+
+def format_sse_data(content: str) -> bytes:
+    """生成OpenAI格式的SSE数据帧（EventSourceResponse原样写出字节）
     
-    格式：data: {"object":"chat.completion.chunk","choices":[{"delta":{"content":"..."}}]}
+    格式：data: {"object":"chat.completion.chunk","choices":[{"delta":{"content":"..."}}]}\n\n
+    帧结构固定，只对content做JSON转义（orjson直接输出UTF-8字节），再拼接预编码的前后缀。
     """
-    data = {
-        "object": "chat.completion.chunk",
-        "choices": [{
-            "delta": {
-                "content": content
-            }
-        }]
-    }
-    # 手动添加'data: '前缀，确保格式符合要求
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return SSE_DATA_PREFIX + orjson.dumps(content) + SSE_DATA_SUFFIX
 
-def format_sse_done() -> str:
+def format_sse_done() -> bytes:
     """生成SSE结束标记
     
-    格式：data: [DONE]
+    格式：data: [DONE]\n\n
     """
-    return "data: [DONE]\n\n"
+    return SSE_DONE_FRAME
+
+def _flush_status(status_buf: list, extra: str = "") -> Optional[bytes]:
+    """将缓冲的状态消息（及可选的追加内容）合并为单个SSE帧并清空缓冲，无内容时返回None"""
+    content = "".join(status_buf) + extra
+    status_buf.clear()
+    return format_sse_data(content) if content else None
+
+def stream_message(message: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """将消息按固定大小分块流式输出（同步生成器）
 
-def stream_message(message: str, chunk_size: int = 1):
-    """将消息按字符流式输出（同步生成器）"""
+    仅用于评阅报告正文；步骤/错误提示等固定模板直接以单个SSE帧发送。
+    客户端按 delta.content 拼接内容，分块大小不影响最终结果。
+    """
     for i in range(0, len(message), chunk_size):
         chunk = message[i:i + chunk_size]
         yield format_sse_data(chunk)
 
 
-async def run_with_heartbeat(task_func, *args, heartbeat_interval=25, timeout=None, **kwargs):
+def _build_msg_frames(templates: dict) -> dict:
+    """将不含占位符的消息模板预先编码为SSE帧；请求超时提示中的秒数固定不变，同样预先填入"""
+    frames = {key: format_sse_data(text) for key, text in templates.items() if '{' not in text}
+    frames['error_timeout'] = format_sse_data(templates['error_timeout'].format(t=REQUEST_TIMEOUT))
+    return frames
+
+
+# 固定内容的SSE帧在导入时编码一次，发送时直接复用
+_MSG_FRAMES_ZH = _build_msg_frames(_MSG_TEMPLATES_ZH)
+_MSG_FRAMES_EN = _build_msg_frames(_MSG_TEMPLATES_EN)
+
+# 评阅报告正文结束后的段落分隔帧
+_SSE_PARAGRAPH_FRAME = format_sse_data("\n\n")
+
+
+async def _run_stage(task_func, *args, timeout=None, **kwargs):
     """
-    执行长时间任务，期间定期发送心跳数据
+    执行单个阶段并直接返回结果，超时则取消
+    
+    同步函数放到线程中执行；协程函数（异步HTTP调用）直接在事件循环中等待，不占用线程池。
+    连接保活由EventSourceResponse的ping注释完成，阶段执行期间无需产出心跳数据，
+    因此调用方直接 await 结果；也可包装为asyncio任务以并行或取消。
     
     Args:
-        task_func: 要执行的同步函数
+        task_func: 要执行的同步函数或协程函数
         *args, **kwargs: 传递给函数的参数
-        heartbeat_interval: 心跳间隔（秒），默认25秒
+        timeout: 任务超时时间（秒），None表示不超时
     
-    Yields:
-        心跳数据（空格字符）或任务结果
+    Returns:
+        任务结果
+    """
+    if asyncio.iscoroutinefunction(task_func):
+        awaitable = task_func(*args, **kwargs)
+    else:
+        awaitable = asyncio.to_thread(task_func, *args, **kwargs)
+    try:
+        # asyncio.timeout 只登记一个定时回调，不像 wait_for 那样为每次调用额外包装一层任务
+        async with asyncio.timeout(timeout):
+            return await awaitable
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
+    except Exception as e:
+        # 堆栈由调用方统一记录，这里只记录一次简要信息
+        logger.warning("⚠️  任务执行失败: %s", e)
+        raise e
+
+
+async def stream_in_thread(gen_func, *args, timeout=None, **kwargs):
     """
-    import asyncio
-    import time
+    在线程中迭代同步生成器，逐段转发其输出
     
-    start_time = time.time()
-    last_heartbeat = start_time
+    Args:
+        gen_func: 返回同步生成器的函数
+        *args: 位置参数
+        timeout: 整体超时时间（秒），None表示不超时
+        **kwargs: 关键字参数
     
-    # 创建任务（使用asyncio.to_thread将同步函数转换为协程）
-    task = asyncio.create_task(asyncio.to_thread(task_func, *args, **kwargs))
+    Yields:
+        生成器产出的片段
+    """
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+    stop = threading.Event()
     
-    # 在任务执行期间定期发送心跳
-    while not task.done():
-        await asyncio.sleep(1)  # 每秒检查一次
-        now = time.time()
-        
-        # 如果超过心跳间隔，发送心跳数据
-        if now - last_heartbeat >= heartbeat_interval:
-            yield format_sse_data(" ")  # 发送一个空格作为心跳
-            last_heartbeat = now
-        
-        # 如果设置了超时并且超过总时长，取消任务
-        if timeout is not None and (now - start_time) > timeout:
-            task.cancel()
-            raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
+    def _put(item):
+        try:
+            loop.call_soon_threadsafe(pieces.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            stop.set()
     
-    # 等待任务完成并返回结果
+    def _produce():
+        gen = gen_func(*args, **kwargs)
+        try:
+            for piece in gen:
+                if stop.is_set():
+                    return
+                _put(("PIECE", piece))
+            _put(("END", None))
+        except Exception as e:
+            _put(("ERROR", e))
+        finally:
+            gen.close()
+    
+    # run_in_executor 不会复制上下文，显式带上（LLM取消标志通过上下文传递）
+    loop.run_in_executor(None, contextvars.copy_context().run, _produce)
+    deadline = None if timeout is None else loop.time() + timeout
     try:
-        result = await task
-        # 使用特殊标记来区分结果和心跳数据
-        # 返回一个元组，第一个元素是标记，第二个元素是结果
-        yield ("RESULT", result)
-    except Exception as e:
-        # 如果任务失败，记录错误并重新抛出异常
-        print(f"⚠️  任务执行失败: {e}")
-        import traceback
-        print(traceback.format_exc())
-        raise e
+        while True:
+            try:
+                # 每个片段都要等待一次，用 timeout_at 代替 wait_for，避免逐片段创建任务
+                async with asyncio.timeout_at(deadline):
+                    kind, value = await pieces.get()
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
+            if kind == "END":
+                break
+            if kind == "ERROR":
+                raise value
+            yield value
+    finally:
+        # 提前结束（超时、客户端断开）时通知线程停止消费LLM流
+        stop.set()
+
+
+async def _parse_pdf_cached(pdf_parser: PDFParser, stage_key: str, pdf: Union[str, bytes], timeout: int, language: str):
+    """带阶段缓存的PDF解析，仅缓存无错误的解析结果；文本提取在进程池中完成，结构化解析（LLM调用）在线程中完成"""
+    structured_info = stage_cache.get(stage_key, "structured_info")
+    if structured_info is not None:
+        return structured_info
+    if isinstance(pdf, bytes):
+        try:
+            # 够结构化解析使用即停止，长论文不再处理后续页面
+            pdf_text = await extract_pdf_text_async(pdf, MAX_PARSE_TEXT_CHARS)
+        except Exception as e:
+            # 与 PDFParser.parse 一致：返回错误信息，但不中断流程
+            return {"error": f"PDF解析失败: {str(e)}", "raw_text": ""}
+        structured_info = await asyncio.to_thread(pdf_parser.parse_text, pdf_text, timeout, language)
+    else:
+        structured_info = await asyncio.to_thread(pdf_parser.parse, pdf, timeout, language)
+    if structured_info and "error" not in structured_info:
+        stage_cache.put(stage_key, "structured_info", structured_info)
+    return structured_info
+
+
+async def _extract_keywords_cached(paper_analyzer: PaperAnalyzer, stage_key: str, structured_info: dict, paper_text: str,
+                                   timeout: int, language: str):
+    """带阶段缓存的关键词提取（LLM调用走异步HTTP），仅在结构化解析无错误时缓存"""
+    keywords = stage_cache.get(stage_key, "keywords")
+    if keywords is not None:
+        return keywords
+    keywords = await paper_analyzer.aextract_keywords(structured_info, timeout, language, info_text=paper_text)
+    if keywords and "error" not in structured_info:
+        stage_cache.put(stage_key, "keywords", keywords)
+    return keywords
+
 
+def _retrieve_related_papers_cached(paper_analyzer: PaperAnalyzer, stage_key: str, query: str, keywords: list, timeout: int):
+    """带阶段缓存的相关论文检索，仅在查询相同且检索到论文时复用"""
+    cached = stage_cache.get(stage_key, "related_papers")
+    if cached is not None and cached.get("query") == query:
+        return cached["papers"]
+    related_papers = paper_analyzer.retrieve_related_papers(query, keywords, timeout)
+    if related_papers:
+        stage_cache.put(stage_key, "related_papers", {"query": query, "papers": related_papers})
+    return related_papers
 
-async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenerator[str, None]:
-    """内部生成器函数，执行实际的评阅逻辑"""
+
+async def _analyze_innovation_cached(paper_analyzer: PaperAnalyzer, stage_key: str, structured_info: dict, paper_text: str,
+                                     related_papers: list, timeout: int, language: str):
+    """带阶段缓存的创新点分析（LLM调用走异步HTTP），仅在相关论文相同且分析成功时复用"""
+    papers_key = "\n".join(paper["title"] for paper in related_papers)
+    cached = stage_cache.get(stage_key, "innovation_analysis")
+    if cached is not None and cached.get("papers") == papers_key:
+        return cached["analysis"]
+    analysis = await paper_analyzer.aanalyze_innovation(structured_info, related_papers, timeout, language, info_text=paper_text)
+    failed = not analysis or analysis.startswith(("创新点分析失败", "Innovation analysis failed"))
+    if not failed and "error" not in structured_info:
+        stage_cache.put(stage_key, "innovation_analysis", {"papers": papers_key, "analysis": analysis})
+    return analysis
+
+
+async def _generate_review_internal(query: str, pdf_content: str, state, language: str = 'en') -> AsyncGenerator[bytes, None]:
+    """内部生成器函数，执行实际的评阅逻辑（language 由调用方检测一次后传入）"""
     start_time = time.time()
     
+    # 根据语言选择消息模板（模块级常量，避免每个请求重复构建）；在try之外选择，异常分支同样可用
+    msg_templates = _MSG_TEMPLATES_ZH if language == 'zh' else _MSG_TEMPLATES_EN
+    msg_frames = _MSG_FRAMES_ZH if language == 'zh' else _MSG_FRAMES_EN
+    
     try:
         # print(f"[DEBUG] 开始执行论文评阅，query长度: {len(query)}, pdf_content长度: {len(pdf_content)}")
         
-        # 先检测语言，用于后续消息模板
-        language = await asyncio.to_thread(detect_language, query)
-        # print(f"[DEBUG] 检测到语言: {'中文' if language == 'zh' else 'English'}")
-        
-        # 根据语言设置消息模板
-        if language == 'zh':
-            msg_templates = {
-                'step1': "### 📄 步骤 1/6: PDF解析与结构化提取\n\n✅ 已完成\n\n",
-                'step2': "### 🔑 步骤 2/6: 关键信息提取\n\n✅ 已完成\n\n",
-                'step3': lambda n: (
-                    "### 📚 步骤 3/6: 相关论文检索\n\n"
-                    f"✅ 已检索到 {n} 篇相关论文\n\n" if n is not None else
-                    "### 📚 步骤 3/6: 相关论文检索\n\n✅ 已完成\n\n"
-                ),
-                'step3_skip_degraded': "### 📚 步骤 3/6: 相关论文检索\n\n⚠️ 由于PDF解析信息不足，跳过外部论文检索，后续分析仅基于上传论文内容。\n\n",
-                'step3_skip_no_query': "### 📚 步骤 3/6: 相关论文检索\n\n⚠️ 无法生成有效查询，跳过外部论文检索。\n\n",
-                'step4': "### 💡 步骤 4/6: 语义分析与创新点识别\n\n✅ 已完成\n\n",
-                'step5': "### ⭐ 步骤 5/6: 多维度深度评估\n\n✅ 已完成\n\n",
-                'step6': "### 📋 步骤 6/6: 生成评阅报告\n\n",
-                'error_config': "## ❌ 错误\n\n配置验证失败，请检查环境变量设置\n\n",
-                'error_config_exception': lambda e: f"## ❌ 错误\n\n配置验证异常: {e}\n\n",
-                'error_llm_init': lambda e: f"## ❌ 错误\n\nLLM客户端初始化失败: {e}\n\n",
-                'error_embedding_init': lambda e: f"## ❌ 错误\n\nEmbedding客户端初始化失败: {e}\n\n",
-                'error_retriever_init': lambda e: f"## ❌ 错误\n\n论文检索器初始化失败: {e}\n\n",
-                'error_pdf_parse': lambda e: f"## ❌ 错误\n\nPDF解析失败，无法继续: {e}\n\n",
-                'error_key_extraction': "## ❌ 错误\n\n关键信息提取失败\n\n",
-                'error_retrieval': lambda e: f"## ❌ 错误\n\n论文检索失败: {e}\n\n",
-                'error_analysis': lambda e: f"## ❌ 错误\n\n分析失败: {e}\n\n",
-                'error_review': lambda e: f"## ❌ 错误\n\n评阅报告生成失败: {e}\n\n",
-                'error_timeout': lambda t: f"## ❌ 超时错误\n\n请求处理超过 {t} 秒，已自动终止\n\n",
-                'error_general': lambda e: f"## ❌ 错误\n\n程序执行失败: {e}\n\n",
-                'pdf_timeout': "⚠️ PDF解析超时，使用备用方法提取基本信息\n\n",
-                'key_extraction_timeout': "⚠️ 关键信息提取超时，使用备用方法\n\n",
-                'pdf_fallback': "基本信息提取完成\n\n",
-                'pdf_warning': lambda e: f"⚠️ PDF解析警告: {e}\n\n"
-            }
-        else:
-            msg_templates = {
-                'step1': "### 📄 Step 1/6: PDF Parsing and Structure Extraction\n\n✅ Completed\n\n",
-                'step2': "### 🔑 Step 2/6: Key Information Extraction\n\n✅ Completed\n\n",
-                'step3': lambda n: (
-                    "### 📚 Step 3/6: Related Paper Retrieval\n\n"
-                    f"✅ Retrieved {n} related papers\n\n" if n is not None else
-                    "### 📚 Step 3/6: Related Paper Retrieval\n\n✅ Completed\n\n"
-                ),
-                'step3_skip_degraded': "### 📚 Step 3/6: Related Paper Retrieval\n\n⚠️ Skipped because the parsed PDF lacks reliable structure; subsequent analysis relies solely on the uploaded manuscript.\n\n",
-                'step3_skip_no_query': "### 📚 Step 3/6: Related Paper Retrieval\n\n⚠️ Skipped because no valid query could be generated from the PDF content.\n\n",
-                'step4': "### 💡 Step 4/6: Semantic Analysis and Innovation Identification\n\n✅ Completed\n\n",
-                'step5': "### ⭐ Step 5/6: Multi-dimensional Deep Evaluation\n\n✅ Completed\n\n",
-                'step6': "### 📋 Step 6/6: Review Report Generation\n\n",
-                'error_config': "## ❌ Error\n\nConfiguration validation failed. Please check environment variables.\n\n",
-                'error_config_exception': lambda e: f"## ❌ Error\n\nConfiguration validation exception: {e}\n\n",
-                'error_llm_init': lambda e: f"## ❌ Error\n\nLLM client initialization failed: {e}\n\n",
-                'error_embedding_init': lambda e: f"## ❌ Error\n\nEmbedding client initialization failed: {e}\n\n",
-                'error_retriever_init': lambda e: f"## ❌ Error\n\nPaper retriever initialization failed: {e}\n\n",
-                'error_pdf_parse': lambda e: f"## ❌ Error\n\nPDF parsing failed. Cannot continue: {e}\n\n",
-                'error_key_extraction': "## ❌ Error\n\nKey information extraction failed.\n\n",
-                'error_retrieval': lambda e: f"## ❌ Error\n\nPaper retrieval failed: {e}\n\n",
-                'error_analysis': lambda e: f"## ❌ Error\n\nAnalysis failed: {e}\n\n",
-                'error_review': lambda e: f"## ❌ Error\n\nReview report generation failed: {e}\n\n",
-                'error_timeout': lambda t: f"## ❌ Timeout Error\n\nRequest processing exceeded {t} seconds. Automatically terminated.\n\n",
-                'error_general': lambda e: f"## ❌ Error\n\nProcess execution failed: {e}\n\n",
-                'pdf_timeout': "⚠️ PDF parsing timeout, using fallback method to extract basic information\n\n",
-                'key_extraction_timeout': "⚠️ Key information extraction timeout, using fallback method\n\n",
-                'pdf_fallback': "Basic information extraction completed\n\n",
-                'pdf_warning': lambda e: f"⚠️ PDF parsing warning: {e}\n\n"
-            }
+        # 精确匹配缓存：相同的query与PDF直接返回缓存的评阅报告
+        cache_key = ReviewCache.make_key(query, pdf_content, language)
+        cached_review = review_cache.get(cache_key)
+        if cached_review:
+            for chunk in stream_message(f"{cached_review}\n\n"):
+                yield chunk
+            return
     
         # 验证配置（不输出）
         # print("[DEBUG] 开始验证配置")
         try:
-            config_valid = await asyncio.to_thread(Config.validate_config)
+            config_valid = Config.validate_config()
             if not config_valid:
                 # print("[DEBUG] 配置验证失败")
-                for chunk in stream_message(msg_templates['error_config']):
-                    yield chunk
+                yield msg_frames['error_config']
                 return
             # print("[DEBUG] 配置验证成功")
         except Exception as e:
             # print(f"[DEBUG] 配置验证异常: {e}")
-            for chunk in stream_message(msg_templates['error_config_exception'](e)):
-                yield chunk
+            yield format_sse_data(msg_templates['error_config_exception'].format(e=e))
             return
     
-        # 创建组件（不输出初始化信息）
-        # print("[DEBUG] 开始初始化LLM客户端")
-        try:
-            llm_client = LLMClient()
-            # print("[DEBUG] LLM客户端初始化成功")
-        except Exception as e:
-            # print(f"[DEBUG] LLM客户端初始化失败: {e}")
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_llm_init'](e)):
-                yield chunk
-            return
+        # 复用应用启动时创建的共享组件（见lifespan）
+        embedding_client = state.embedding_client
+        pdf_parser = state.pdf_parser
+        paper_analyzer = state.paper_analyzer
+        reviewer = state.reviewer
         
-        # print("[DEBUG] 开始初始化Embedding客户端")
+        # 阶段结果缓存键：PDF内容 + 语言 + 模型名（切换模型后缓存自动失效）
         try:
-            embedding_client = EmbeddingClient()
-            # print("[DEBUG] Embedding客户端初始化成功")
-        except Exception as e:
-            # print(f"[DEBUG] Embedding客户端初始化失败: {e}")
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_embedding_init'](e)):
-                yield chunk
-            return
-        
-        # print("[DEBUG] 开始初始化论文检索器")
-        try:
-            retriever = PaperRetriever()
-            # print("[DEBUG] 论文检索器初始化成功")
-        except Exception as e:
-            # print(f"[DEBUG] 论文检索器初始化失败: {e}")
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_retriever_init'](e)):
-                yield chunk
-            return
-        
-        # 创建解析器、分析器和评阅器
-        # print("[DEBUG] 创建解析器、分析器和评阅器")
-        pdf_parser = PDFParser(llm_client)
-        paper_analyzer = PaperAnalyzer(llm_client, embedding_client, retriever)
-        reviewer = Reviewer(llm_client)
+            stage_model = f"{Config.LLM_MODEL}/{Config.LLM_REASONING_MODEL}"
+        except ValueError:
+            stage_model = Config.LLM_MODEL
+        stage_key = StageCache.make_key(pdf_content, language, stage_model)
         
         # 阶段1: PDF解析（简化输出，增加心跳）
         # print("[DEBUG] 开始阶段1: PDF解析")
         structured_info = None
+        
+        # 步骤完成等状态消息先缓冲，在下一次耗时等待前合并为一个SSE帧发送
+        status_buf = []
+        
+        # Base64只解码一次，解析与备用方法共用；解码失败时交给parse按原流程返回错误信息
+        try:
+            pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
+        except ValueError:
+            pdf_bytes = None
+        
         try:
             # 增加超时时间，因为使用了reasoner模型需要更长时间
             parse_timeout = Config.PDF_PARSE_TIMEOUT * 2  # 将超时时间翻倍
-            heartbeat_interval = 15
-            async for item in run_with_heartbeat(
-                pdf_parser.parse,
-                pdf_content,
+            structured_info = await _run_stage(
+                _parse_pdf_cached,
+                pdf_parser,
+                stage_key,
+                pdf_bytes if pdf_bytes is not None else pdf_content,
                 parse_timeout,
                 language,
-                heartbeat_interval=heartbeat_interval,
                 timeout=parse_timeout + 10
-            ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    structured_info = item[1]
-                    break
-                else:
-                    yield item
+            )
         except asyncio.TimeoutError:
             # print("[DEBUG] PDF解析超时，尝试使用备用方法提取基本信息")
-            for chunk in stream_message(msg_templates['pdf_timeout']):
-                yield chunk
+            yield msg_frames['pdf_timeout']
             # 超时时，尝试提取基本信息
             try:
                 # 直接提取PDF文本，不进行结构化解析
-                pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
-                pdf_text = await asyncio.to_thread(pdf_parser.extract_text_from_pdf, pdf_bytes)
+                if pdf_bytes is None:
+                    raise ValueError("Base64解码失败")
+                # 备用方法只用到前10000字符，提取够了就不再处理后续页面
+                pdf_text = await extract_pdf_text_async(pdf_bytes, _FALLBACK_TEXT_CHARS)
                 
                 # 创建基本的结构化信息
                 structured_info = {
-                    "raw_text": pdf_text[:10000],  # 保留前10000字符
+                    "raw_text": pdf_text[:_FALLBACK_TEXT_CHARS],  # 保留前10000字符
                     "Title": "",
                     "Abstract": pdf_text[:500] if len(pdf_text) > 0 else "",  # 使用前500字符作为摘要
                     "error": "PDF结构化解析超时，已使用备用方法提取基本信息"
                 }
                 
-                # 尝试从文本中提取标题（简单方法：取第一行或前100个字符）
-                lines = pdf_text.split('\n')
-                for line in lines[:10]:  # 检查前10行
-                    line = line.strip()
-                    if len(line) > 10 and len(line) < 200:  # 标题通常在10-200字符之间
-                        structured_info["Title"] = line
-                        break
+                # 尝试从文本开头提取标题（第一个长度合适的行），否则取前100个字符
+                title_match = _TITLE_RE.search(pdf_text, 0, _TITLE_SCAN_CHARS)
+                if title_match:
+                    structured_info["Title"] = title_match.group(1)
                 
                 if not structured_info["Title"]:
                     structured_info["Title"] = pdf_text[:100].strip().replace('\n', ' ')
                 
                 # print("[DEBUG] 备用方法提取基本信息完成")
-                for chunk in stream_message(msg_templates['pdf_fallback']):
-                    yield chunk
+                status_buf.append(msg_templates['pdf_fallback'])
             except Exception as e:
                 # print(f"[DEBUG] 备用方法也失败: {e}")
-                for chunk in stream_message(msg_templates['error_pdf_parse'](e)):
-                    yield chunk
+                yield format_sse_data(msg_templates['error_pdf_parse'].format(e=e))
                 return
         except Exception as e:
             # print(f"[DEBUG] PDF解析失败: {e}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("PDF解析失败")
             # 尝试使用备用方法
             try:
-                pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
-                pdf_text = await asyncio.to_thread(pdf_parser.extract_text_from_pdf, pdf_bytes)
+                if pdf_bytes is None:
+                    raise ValueError("Base64解码失败")
+                # 备用方法只用到前10000字符，提取够了就不再处理后续页面
+                pdf_text = await extract_pdf_text_async(pdf_bytes, _FALLBACK_TEXT_CHARS)
                 structured_info = {
-                    "raw_text": pdf_text[:10000],
+                    "raw_text": pdf_text[:_FALLBACK_TEXT_CHARS],
                     "Title": pdf_text[:100].strip().replace('\n', ' ') if pdf_text else "",
                     "Abstract": pdf_text[:500] if len(pdf_text) > 0 else "",
                     "error": f"PDF解析失败: {str(e)}"
                 }
                 # print("[DEBUG] 使用备用方法提取基本信息")
-                for chunk in stream_message(msg_templates['pdf_timeout']):
-                    yield chunk
-                for chunk in stream_message(msg_templates['pdf_fallback']):
-                    yield chunk
+                status_buf.append(msg_templates['pdf_timeout'])
+                status_buf.append(msg_templates['pdf_fallback'])
             except Exception as e2:
                 # print(f"[DEBUG] 备用方法也失败: {e2}")
-                for chunk in stream_message(msg_templates['error_pdf_parse'](e2)):
-                    yield chunk
+                yield format_sse_data(msg_templates['error_pdf_parse'].format(e=e2))
                 return
         
         if structured_info is None:
-            for chunk in stream_message(msg_templates['error_pdf_parse']("PDF parsing returned empty result")):
-                yield chunk
+            yield format_sse_data(msg_templates['error_pdf_parse'].format(e="PDF parsing returned empty result"))
             return
         
-        # PDF解析完成后的debug信息
-        print("\n" + "="*80)
-        print("[DEBUG] PDF解析完成 - 初步结果")
-        print("="*80)
-        print(f"[DEBUG] structured_info的键: {list(structured_info.keys())}")
-        if "error" in structured_info:
-            print(f"[DEBUG] ⚠️ 检测到error字段: {structured_info.get('error')}")
-        if "raw_text" in structured_info:
-            raw_text_len = len(structured_info.get("raw_text", ""))
-            print(f"[DEBUG] raw_text长度: {raw_text_len} 字符")
-        if "raw_response" in structured_info:
-            raw_response_len = len(structured_info.get("raw_response", ""))
-            print(f"[DEBUG] raw_response长度: {raw_response_len} 字符")
-            # 显示raw_response的前500字符，帮助诊断LLM输出格式
-            raw_response_preview = structured_info.get("raw_response", "")[:500]
-            print(f"[DEBUG] raw_response预览:\n{raw_response_preview}...")
-        print("="*80 + "\n")
+        # PDF解析完成后的debug信息（仅在DEBUG级别时构建）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[DEBUG] PDF解析完成 - structured_info的键: %s, error: %s, raw_text长度: %d, raw_response长度: %d\nraw_response预览:\n%s",
+                list(structured_info.keys()),
+                structured_info.get("error"),
+                len(structured_info.get("raw_text", "")),
+                len(structured_info.get("raw_response", "")),
+                # 显示raw_response的前500字符，帮助诊断LLM输出格式
+                structured_info.get("raw_response", "")[:500]
+            )
         
         # 检查是否有错误
         # print("[DEBUG] 检查PDF解析结果")
         if "error" in structured_info:
             # print(f"[DEBUG] PDF解析有警告: {structured_info.get('error')}")
-            for chunk in stream_message(msg_templates['pdf_warning'](structured_info.get('error'))):
-                yield chunk
+            status_buf.append(msg_templates['pdf_warning'].format(e=structured_info.get('error')))
             # 如果只有错误信息，无法继续
             if not structured_info.get("raw_text"):
                 # print("[DEBUG] PDF解析失败，无法继续")
-                if language == 'zh':
-                    error_msg = "## ❌ 错误\n\nPDF解析失败，无法继续\n\n"
-                else:
-                    error_msg = "## ❌ Error\n\nPDF parsing failed. Cannot continue.\n\n"
-                for chunk in stream_message(error_msg):
-                    yield chunk
+                # 与缓冲中的解析警告合并为一帧发送
+                yield _flush_status(status_buf, msg_templates['error_pdf_no_text'])
                 return
         
         # 输出步骤1完成
-        for chunk in stream_message(msg_templates['step1']):
-            yield chunk
+        status_buf.append(msg_templates['step1'])
+        
+        # 语义缓存：以 Title+Abstract 的embedding匹配近似重复的论文（如仅有排版、错字差异的修订版）
+        cache_embedding = None
+        cache_text = f"{structured_info.get('Title', '')}\n{structured_info.get('Abstract', '')}".strip()
+        if cache_text:
+            frame = _flush_status(status_buf)
+            if frame:
+                yield frame
+            try:
+                cache_embedding = await asyncio.to_thread(embedding_client.encode, cache_text)
+                cached_review = review_cache.get_similar(cache_embedding, language)
+                if cached_review:
+                    review_cache.put(cache_key, cached_review, cache_embedding, language)
+                    for chunk in stream_message(f"{cached_review}\n\n"):
+                        yield chunk
+                    return
+            except Exception as e:
+                logger.warning("⚠️  评阅缓存查询失败: %s", e)
+                cache_embedding = None
         
         # 详细的debug检查
         debug_info = paper_analyzer.debug_core_content_check(structured_info)
@@ -437,32 +745,22 @@ async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenera
         has_error = debug_info["has_error"]
         degraded_parse = (not has_core_sections) or has_error
         
-        # 输出详细的debug信息
-        print("\n" + "="*80)
-        print("[DEBUG] PDF解析结果诊断")
-        print("="*80)
-        print(f"[DEBUG] has_core_content: {has_core_sections}")
-        print(f"[DEBUG] has_error字段: {has_error}")
-        if has_error:
-            print(f"[DEBUG] error消息: {debug_info['error_message']}")
-        print(f"[DEBUG] degraded_parse: {degraded_parse}")
-        print(f"[DEBUG] structured_info中的所有键: {debug_info['all_keys']}")
-        print("\n[DEBUG] 核心章节字段检查结果:")
-        for section, exists in debug_info['core_sections_status'].items():
-            status = "✓ 存在" if exists else "✗ 缺失"
-            value_preview = ""
-            if exists:
-                value = structured_info.get(section, "")
-                value_preview = f" (内容预览: {value[:50]}...)" if len(value) > 50 else f" (内容: {value})"
-            print(f"  {status}: {section}{value_preview}")
-        print(f"\n[DEBUG] 缺失的核心章节字段: {debug_info['missing_core_sections']}")
-        if degraded_parse:
-            print("\n[DEBUG] ⚠️ 触发degraded_parse的原因:")
-            if not has_core_sections:
-                print("  - 原因1: has_core_content() 返回 False (所有核心章节字段都缺失)")
-            if has_error:
-                print(f"  - 原因2: structured_info 中存在 'error' 字段: {debug_info['error_message']}")
-        print("="*80 + "\n")
+        # 详细的debug信息（仅在DEBUG级别时构建）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[DEBUG] PDF解析结果诊断 - has_core_content: %s, has_error: %s, error消息: %s, degraded_parse: %s, "
+                "所有键: %s, 核心章节字段: %s, 缺失的核心章节字段: %s",
+                has_core_sections,
+                has_error,
+                debug_info['error_message'],
+                degraded_parse,
+                debug_info['all_keys'],
+                debug_info['core_sections_status'],
+                debug_info['missing_core_sections']
+            )
+        
+        # 结构化信息只格式化一次，关键词提取、创新点分析与语义相似度共用
+        paper_text = paper_analyzer._format_structured_info(structured_info)
         
         # 阶段2: 关键信息提取与查询构建（简化输出，增加心跳）
         # print("[DEBUG] 开始阶段2: 关键信息提取")
@@ -470,40 +768,35 @@ async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenera
             # 只提取关键词，不进行完整分析（节省时间）
             # 增加超时时间，因为使用了reasoner模型需要更长时间
             extraction_timeout = Config.KEY_EXTRACTION_TIMEOUT * 2  # 将超时时间翻倍
-            heartbeat_interval = 15
-            keywords = []
-            async for item in run_with_heartbeat(
-                paper_analyzer.extract_keywords,
+            frame = _flush_status(status_buf)
+            if frame:
+                yield frame
+            keywords = await _run_stage(
+                _extract_keywords_cached,
+                paper_analyzer,
+                stage_key,
                 structured_info,
+                paper_text,
                 extraction_timeout,
                 language,
-                heartbeat_interval=heartbeat_interval,
                 timeout=extraction_timeout + 10
-            ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    keywords = item[1] or []
-                    break
-                else:
-                    yield item
-            query = await asyncio.to_thread(paper_analyzer.build_query, keywords, structured_info)
+            ) or []
+            query = paper_analyzer.build_query(keywords, structured_info)
             # print(f"[DEBUG] 关键词提取完成: {keywords}")
         except asyncio.TimeoutError:
             # print("[DEBUG] 关键信息提取超时，使用备用方法")
-            for chunk in stream_message(msg_templates['key_extraction_timeout']):
-                yield chunk
+            status_buf.append(msg_templates['key_extraction_timeout'])
             # 使用备用方法提取关键词
-            keywords = await asyncio.to_thread(paper_analyzer._extract_fallback_keywords, structured_info)
-            query = await asyncio.to_thread(paper_analyzer.build_query, keywords, structured_info)
+            keywords = paper_analyzer._extract_fallback_keywords(structured_info)
+            query = paper_analyzer.build_query(keywords, structured_info)
             # print(f"[DEBUG] 备用方法提取关键词完成: {keywords}")
         except Exception as e:
             # print(f"[DEBUG] 关键信息提取失败: {e}")
-            for chunk in stream_message(msg_templates['error_key_extraction']):
-                yield chunk
+            yield _flush_status(status_buf, msg_templates['error_key_extraction'])
             return
         
         # 输出步骤2完成
-        for chunk in stream_message(msg_templates['step2']):
-            yield chunk
+        status_buf.append(msg_templates['step2'])
         
         # 阶段3: 相关论文检索（简化输出）
         # print("[DEBUG] 开始阶段3: 相关论文检索")
@@ -514,180 +807,161 @@ async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenera
         elif degraded_parse:
             skip_reason_key = 'step3_skip_degraded'
         
-        if skip_reason_key:
-            for chunk in stream_message(msg_templates[skip_reason_key]):
-                yield chunk
-        else:
-            if query:
+        # 阶段3与阶段4重叠执行：不带相关论文的创新点分析不依赖检索结果，
+        # 先以推测方式与检索同时启动；检索到论文后再取消它，改走基于论文的分析
+        speculative_innovation = asyncio.create_task(_run_stage(
+            _analyze_innovation_cached,
+            paper_analyzer,
+            stage_key,
+            structured_info,
+            paper_text,
+            [],
+            Config.SEMANTIC_ANALYSIS_TIMEOUT,
+            language,
+            timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT + 10
+        ))
+        # 推测任务的结果可能被丢弃，提前取走异常，避免 "exception was never retrieved" 告警
+        speculative_innovation.add_done_callback(lambda t: t.cancelled() or t.exception())
+        
+        paper_embedding_task = None
+        
+        try:
+            if skip_reason_key:
+                status_buf.append(msg_templates[skip_reason_key])
+            else:
+                # 待评论文的embedding不依赖检索结果，与检索同时获取，阶段4只需再请求相关论文的embedding
+                paper_embedding_task = asyncio.create_task(_run_stage(
+                    embedding_client.encode,
+                    paper_text,
+                    timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT
+                ))
+                paper_embedding_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                frame = _flush_status(status_buf)
+                if frame:
+                    yield frame
                 try:
-                    heartbeat_interval = 15
-                    async for item in run_with_heartbeat(
-                        paper_analyzer.retrieve_related_papers,
+                    related_papers = await _run_stage(
+                        _retrieve_related_papers_cached,
+                        paper_analyzer,
+                        stage_key,
                         query,
                         keywords,
                         Config.RETRIEVAL_TIMEOUT,
-                        heartbeat_interval=heartbeat_interval,
                         timeout=Config.RETRIEVAL_TIMEOUT + 10
-                    ):
-                        if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                            related_papers = item[1] or []
-                            break
-                        else:
-                            yield item
+                    ) or []
                 except Exception as e:
-                    import traceback
-                    print(traceback.format_exc())
+                    logger.exception("论文检索失败")
                     related_papers = []
-            for chunk in stream_message(msg_templates['step3'](len(related_papers))):
-                yield chunk
-        
-        # 阶段4: 语义相似度分析与创新点识别（简化输出，增加心跳防止超时）
-        # print("[DEBUG] 开始阶段4: 语义分析与创新点识别")
-        innovation_analysis = ""
-        
-        # 格式化结构化信息为文本
-        paper_text = paper_analyzer._format_structured_info(structured_info)
-        semantic_similarities = []
-        heartbeat_interval = 15
-        
-        if related_papers:
-            # 有相关论文时，先计算语义相似度，再进行创新点分析
-            try:
-                async for item in run_with_heartbeat(
-                    paper_analyzer.calculate_semantic_similarity,
-                    paper_text,
-                    related_papers,
-                    heartbeat_interval=heartbeat_interval,
-                    timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT
-                ):
-                    if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                        semantic_similarities = item[1] or []
-                    else:
-                        yield item
-                
-                async for item in run_with_heartbeat(
-                    paper_analyzer.analyze_innovation,
-                    structured_info,
-                    related_papers,
-                    Config.SEMANTIC_ANALYSIS_TIMEOUT,
-                    language,
-                    heartbeat_interval=heartbeat_interval,
-                    timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT + 10
-                ):
-                    if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                        innovation_analysis = item[1] or ""
-                    else:
-                        yield item
-            except asyncio.TimeoutError:
-                # print("[DEBUG] 语义分析阶段超时")
-                for chunk in stream_message(msg_templates['error_analysis']("语义分析阶段超时")):
-                    yield chunk
-                if language == 'zh':
-                    innovation_analysis = "语义分析阶段超时，使用论文自身信息进行基本创新点总结。"
-                else:
-                    innovation_analysis = "Semantic analysis timed out. Falling back to a basic innovation summary based on the paper content only."
-            except Exception as e:
-                import traceback
-                print(traceback.format_exc())
-                for chunk in stream_message(msg_templates['error_analysis'](e)):
-                    yield chunk
-                innovation_analysis = ""
-        else:
-            # 没有相关论文时，基于论文本身进行创新点分析，同时发送心跳
-            try:
-                async for item in run_with_heartbeat(
-                    paper_analyzer.analyze_innovation,
-                    structured_info,
-                    [],
-                    Config.SEMANTIC_ANALYSIS_TIMEOUT,
-                    language,
-                    heartbeat_interval=heartbeat_interval,
-                    timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT + 10
-                ):
-                    if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                        innovation_analysis = item[1] or ""
-                    else:
-                        yield item
-            except asyncio.TimeoutError:
-                if language == 'zh':
-                    innovation_analysis = "创新点分析超时，使用论文自身信息进行基本总结。"
-                else:
-                    innovation_analysis = "Innovation analysis timed out. Falling back to a basic summary from the paper itself."
-            except Exception as e:
-                import traceback
-                print(traceback.format_exc())
-                if language == 'zh':
-                    innovation_analysis = f"创新点分析失败: {str(e)}"
-                else:
-                    innovation_analysis = f"Innovation analysis failed: {str(e)}"
+                status_buf.append(msg_templates['step3'].format(n=len(related_papers)))
+            
+            # 阶段4: 语义相似度分析与创新点识别（简化输出）
+            # print("[DEBUG] 开始阶段4: 语义分析与创新点识别")
+            innovation_analysis = ""
+            semantic_similarities = []
+            
+            if related_papers:
+                # 有相关论文时，推测的分析结果不再需要；它是事件循环中的协程（异步HTTP调用），取消即中止上游请求
+                speculative_innovation.cancel()
+                frame = _flush_status(status_buf)
+                if frame:
+                    yield frame
+                try:
+                    try:
+                        paper_embedding = await paper_embedding_task
+                    except Exception:
+                        # 预取失败时由相似度计算自行与相关论文一起请求
+                        paper_embedding = None
+                    semantic_similarities = await _run_stage(
+                        paper_analyzer.calculate_semantic_similarity,
+                        paper_text,
+                        related_papers,
+                        paper_embedding,
+                        timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT
+                    ) or []
+                    
+                    innovation_analysis = await _run_stage(
+                        _analyze_innovation_cached,
+                        paper_analyzer,
+                        stage_key,
+                        structured_info,
+                        paper_text,
+                        related_papers,
+                        Config.SEMANTIC_ANALYSIS_TIMEOUT,
+                        language,
+                        timeout=Config.SEMANTIC_ANALYSIS_TIMEOUT + 10
+                    ) or ""
+                except asyncio.TimeoutError:
+                    # print("[DEBUG] 语义分析阶段超时")
+                    status_buf.append(msg_templates['error_analysis'].format(e="语义分析阶段超时"))
+                    innovation_analysis = msg_templates['analysis_timeout']
+                except Exception as e:
+                    logger.exception("语义分析失败")
+                    status_buf.append(msg_templates['error_analysis'].format(e=e))
+                    innovation_analysis = ""
+            else:
+                # 没有相关论文时，直接使用与检索并行的创新点分析结果
+                frame = _flush_status(status_buf)
+                if frame:
+                    yield frame
+                try:
+                    innovation_analysis = await speculative_innovation or ""
+                except asyncio.TimeoutError:
+                    innovation_analysis = msg_templates['innovation_timeout']
+                except Exception as e:
+                    logger.exception("创新点分析失败")
+                    innovation_analysis = msg_templates['innovation_failed'].format(e=e)
+        finally:
+            # 客户端断开或异常退出时，不留下悬挂的推测任务
+            if not speculative_innovation.done():
+                speculative_innovation.cancel()
+            if paper_embedding_task is not None and not paper_embedding_task.done():
+                paper_embedding_task.cancel()
         
         # 输出步骤4完成
-        for chunk in stream_message(msg_templates['step4']):
-            yield chunk
+        status_buf.append(msg_templates['step4'])
         
         # 阶段5: 多维度深度评估（简化输出，在reviewer.review中完成）
         # print("[DEBUG] 开始阶段5: 多维度深度评估")
         # 输出步骤5完成（评估在reviewer.review中完成）
-        for chunk in stream_message(msg_templates['step5']):
-            yield chunk
+        status_buf.append(msg_templates['step5'])
         
         # 阶段6: 生成评阅报告（完整输出）
         # print("[DEBUG] 开始阶段6: 生成评阅报告")
-        for chunk in stream_message(msg_templates['step6']):
-            yield chunk
+        status_buf.append(msg_templates['step6'])
         
         # 发送进度提示
-        if language == 'zh':
-            progress_msg = "🔄 正在生成评阅报告，请稍候...\n\n"
-        else:
-            progress_msg = "🔄 Generating review report, please wait...\n\n"
-        for chunk in stream_message(progress_msg):
-            yield chunk
+        status_buf.append(msg_templates['review_progress'])
+        frame = _flush_status(status_buf)
+        if frame:
+            yield frame
         
         try:
             # print(f"[DEBUG] 开始生成评阅报告，超时时间: {Config.EVALUATION_TIMEOUT + Config.REPORT_GENERATION_TIMEOUT + 20}秒")
-            review = None
-            async for item in run_with_heartbeat(
-                reviewer.review,
-                structured_info, innovation_analysis, related_papers, 
+            # LLM输出的片段到达即转发，无需等待完整报告；完整文本累积后写入缓存
+            review_parts = []
+            async for piece in stream_in_thread(
+                reviewer.review_stream,
+                structured_info, innovation_analysis, related_papers,
                 Config.EVALUATION_TIMEOUT + Config.REPORT_GENERATION_TIMEOUT, language,
-                heartbeat_interval=25,
                 timeout=Config.EVALUATION_TIMEOUT + Config.REPORT_GENERATION_TIMEOUT + 20
             ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    review = item[1]
-                    # print(f"[DEBUG] 评阅报告生成完成，长度: {len(review) if review else 0} 字符")
-                    break
-                else:
-                    yield item
+                review_parts.append(piece)
+                yield format_sse_data(piece)
+            review = "".join(review_parts)
             
-            if not review or review.strip() == "":
-                # print(f"[DEBUG] 评阅报告为空: review={review}")
-                if language == 'zh':
-                    error_msg = "⚠️ 评阅报告生成失败，返回空内容\n\n"
-                else:
-                    error_msg = "⚠️ Review report generation failed, returned empty content\n\n"
-                for chunk in stream_message(error_msg):
-                    yield chunk
+            if not review.strip():
+                yield msg_frames['review_empty']
             else:
-                # 流式输出评阅报告
-                for chunk in stream_message(f"{review}\n\n"):
-                    yield chunk
+                yield _SSE_PARAGRAPH_FRAME
+                review_cache.put(cache_key, review, cache_embedding, language)
         except asyncio.TimeoutError:
             # print("[DEBUG] 评阅报告生成超时")
-            if language == 'zh':
-                error_msg = "## ❌ 错误\n\n评阅报告生成超时\n\n"
-            else:
-                error_msg = "## ❌ Error\n\nReview report generation timeout\n\n"
-            for chunk in stream_message(error_msg):
-                yield chunk
+            yield msg_frames['error_review_timeout']
             return
         except Exception as e:
             # print(f"[DEBUG] 评阅报告生成失败: {e}")
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_review'](e)):
-                yield chunk
+            logger.exception("评阅报告生成失败")
+            yield format_sse_data(msg_templates['error_review'].format(e=e))
             return
     
         elapsed = time.time() - start_time
@@ -695,25 +969,13 @@ async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenera
         # 不输出总耗时到流式响应，保持输出简洁
     
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ [_generate_review_internal] 未捕获的异常: {e}\n{error_trace}")
+        # 完整堆栈只写入日志，返回给客户端的错误信息不含堆栈
+        logger.exception("❌ [_generate_review_internal] 未捕获的异常")
         # 确保异常信息通过SSE流发送
         try:
-            # 检测语言以使用正确的错误消息
-            try:
-                language = await asyncio.to_thread(detect_language, query)
-                if language == 'zh':
-                    error_msg = f"## ❌ 错误\n\n程序执行失败: {e}\n\n```\n{error_trace}\n```\n\n"
-                else:
-                    error_msg = f"## ❌ Error\n\nProcess execution failed: {e}\n\n```\n{error_trace}\n```\n\n"
-            except:
-                # 如果检测语言失败，使用英文
-                error_msg = f"## ❌ Error\n\nProcess execution failed: {e}\n\n```\n{error_trace}\n```\n\n"
-            for chunk in stream_message(error_msg):
-                yield chunk
-        except Exception as send_error:
-            print(f"❌ 发送错误信息时失败: {send_error}")
+            yield format_sse_data(msg_templates['error_general'].format(e=e))
+        except Exception:
+            logger.exception("❌ 发送错误信息时失败")
             # 如果发送失败，至少尝试发送一个简单的错误消息
             try:
                 yield format_sse_data(f"## ❌ Error\n\nProcess execution failed: {e}\n\n")
@@ -721,70 +983,150 @@ async def _generate_review_internal(query: str, pdf_content: str) -> AsyncGenera
                 pass
 
 
-async def generate_review_stream(query: str, pdf_content: str) -> AsyncGenerator[str, None]:
+async def generate_review_stream(query: str, pdf_content: str, state) -> AsyncGenerator[bytes, None]:
     """生成评阅的流式输出生成器（带超时控制）"""
-    start_time = time.time()
+    # 整体截止时间只计算一次（含排队等待评阅名额的时间）
+    deadline = asyncio.get_running_loop().time() + REQUEST_TIMEOUT
     # print(f"[DEBUG] [generate_review_stream] 生成器启动，query长度: {len(query)}, pdf_content长度: {len(pdf_content)}")
     
-    try:
-        item_count = 0
-        async for item in _generate_review_internal(query, pdf_content):
-            item_count += 1
-            # if item_count % 100 == 0:
-            #     print(f"[DEBUG] [generate_review_stream] 已yield {item_count} 个chunk")
-            
-            # 检查是否超时
-            elapsed = time.time() - start_time
-            if elapsed > REQUEST_TIMEOUT:
-                # print(f"[DEBUG] [generate_review_stream] 请求超时，已处理 {item_count} 个chunk")
-                # 检测语言以使用正确的错误消息
-                try:
-                    language = await asyncio.to_thread(detect_language, query)
-                    if language == 'zh':
-                        timeout_msg = f"## ❌ 超时错误\n\n请求处理超过 {REQUEST_TIMEOUT} 秒，已自动终止\n\n"
-                    else:
-                        timeout_msg = f"## ❌ Timeout Error\n\nRequest processing exceeded {REQUEST_TIMEOUT} seconds. Automatically terminated.\n\n"
-                except:
-                    timeout_msg = f"## ❌ Timeout Error\n\nRequest processing exceeded {REQUEST_TIMEOUT} seconds. Automatically terminated.\n\n"
-                for chunk in stream_message(timeout_msg):
-                    yield chunk
-                yield format_sse_done()
-                return
-            yield item
-        
-        # print(f"[DEBUG] [generate_review_stream] 生成器正常完成，共yield {item_count} 个chunk")
-        # 发送结束标记
-        yield format_sse_done()
-                
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ [generate_review_stream] 生成器错误: {e}\n{error_trace}")
+    # 占用一个评阅名额，流结束（含客户端断开）时释放
+    async with _REVIEW_SEMAPHORE:
+        # 语言只检测一次，正常流程与各错误分支共用
+        language = 'en'
+        # 本请求的LLM取消标志，工作线程中的LLM调用通过上下文读取
+        cancel_event = threading.Event()
+        llm_cancel_event.set(cancel_event)
         try:
-            # 检测语言以使用正确的错误消息
+            language = await detect_language_async(query)
+            internal = _generate_review_internal(query, pdf_content, state, language)
             try:
-                language = await asyncio.to_thread(detect_language, query)
-                if language == 'zh':
-                    error_msg = f"## ❌ 错误\n\n程序执行失败: {e}\n\n```\n{error_trace}\n```\n\n"
-                else:
-                    error_msg = f"## ❌ Error\n\nProcess execution failed: {e}\n\n```\n{error_trace}\n```\n\n"
-            except:
-                # 如果检测语言失败，使用英文
-                error_msg = f"## ❌ Error\n\nProcess execution failed: {e}\n\n```\n{error_trace}\n```\n\n"
-            for chunk in stream_message(error_msg):
-                yield chunk
+                while True:
+                    # 超时范围只包住对内部生成器的等待、不跨越yield，
+                    # 到期时取消的是正在执行的阶段，而不是EventSourceResponse的发送
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            item = await anext(internal)
+                    except StopAsyncIteration:
+                        break
+                    yield item
+            except asyncio.TimeoutError:
+                await internal.aclose()
+                # print(f"[DEBUG] [generate_review_stream] 请求超时")
+                yield (_MSG_FRAMES_ZH if language == 'zh' else _MSG_FRAMES_EN)['error_timeout']
+                yield format_sse_done()
+                return
+            
+            # print(f"[DEBUG] [generate_review_stream] 生成器正常完成")
+            # 发送结束标记
             yield format_sse_done()
-        except Exception as send_error:
-            print(f"❌ [generate_review_stream] 发送错误信息时失败: {send_error}")
+                    
+        except Exception as e:
+            # 完整堆栈只写入日志，返回给客户端的错误信息不含堆栈
+            logger.exception("❌ [generate_review_stream] 生成器错误")
             try:
-                yield format_sse_data(f"## ❌ Error\n\nProcess execution failed: {e}\n\n")
+                msg_templates = _MSG_TEMPLATES_ZH if language == 'zh' else _MSG_TEMPLATES_EN
+                yield format_sse_data(msg_templates['error_general'].format(e=e))
                 yield format_sse_done()
-            except:
-                pass
+            except Exception:
+                logger.exception("❌ [generate_review_stream] 发送错误信息时失败")
+                try:
+                    yield format_sse_data(f"## ❌ Error\n\nProcess execution failed: {e}\n\n")
+                    yield format_sse_done()
+                except:
+                    pass
+        finally:
+            # 客户端断开（生成器被关闭或取消）时通知仍在工作线程中的LLM调用中止
+            cancel_event.set()
+
+
+class _SharedReview:
+    """
+    一次评阅计算的输出广播：生产任务逐帧发布，所有订阅的请求先回放已产生的帧，再等待后续帧
+    
+    全部订阅者断开后取消生产任务，不再为无人接收的输出消耗LLM调用。
+    """
+
+    def __init__(self):
+        self.frames = []
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, frame: bytes):
+        self.frames.append(frame)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        # 唤醒当前所有等待者，并换一个新的Event供下一轮等待
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncGenerator[bytes, None]:
+        """从头回放并持续转发输出，直到生产结束"""
+        index = 0
+        while True:
+            while index < len(self.frames):
+                yield self.frames[index]
+                index += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+def _review_request_key(query: str, pdf_content: str) -> str:
+    """并发合并用的请求键：query与PDF内容都相同的请求输出一致"""
+    digest = hashlib.sha256(query.encode('utf-8'))
+    digest.update(b"\x00")
+    digest.update(pdf_content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+async def _produce_shared_review(shared: _SharedReview, query: str, pdf_content: str, state):
+    """生产任务：执行一次评阅并把输出发布给所有订阅者"""
+    async for frame in generate_review_stream(query, pdf_content, state):
+        shared.publish(frame)
+
+
+def _release_shared_review(key: str, shared: _SharedReview):
+    """生产结束（含取消）后通知订阅者并从进行中列表移除"""
+    shared.finish()
+    if _INFLIGHT_REVIEWS.get(key) is shared:
+        del _INFLIGHT_REVIEWS[key]
+
+
+async def coalesced_review_stream(key: str, query: str, pdf_content: str, state) -> AsyncGenerator[bytes, None]:
+    """
+    评阅流式输出（并发合并）：相同请求已在进行时订阅其输出，否则启动新的生产任务
+    
+    客户端断开只退订；最后一个订阅者断开时取消生产任务（进而中止LLM调用）。
+    """
+    shared = _INFLIGHT_REVIEWS.get(key)
+    if shared is None:
+        shared = _SharedReview()
+        _INFLIGHT_REVIEWS[key] = shared
+        shared.task = asyncio.create_task(_produce_shared_review(shared, query, pdf_content, state))
+        # 用回调清理：任务在开始执行前就被取消时协程内的 finally 不会运行
+        shared.task.add_done_callback(lambda task: _release_shared_review(key, shared))
+    shared.subscribers += 1
+    try:
+        async for frame in shared.follow():
+            yield frame
+    finally:
+        shared.subscribers -= 1
+        if shared.subscribers == 0 and not shared.done:
+            # 立即移除，取消完成前到达的相同请求会启动新的计算，而不是订阅正在取消的输出
+            if _INFLIGHT_REVIEWS.get(key) is shared:
+                del _INFLIGHT_REVIEWS[key]
+            shared.task.cancel()
 
 
 @app.post("/paper_review")
-async def paper_review(request: PaperReviewRequest):
+async def paper_review(request: PaperReviewRequest, http_request: Request):
     """
     论文评阅API端点
     """
@@ -794,13 +1136,17 @@ async def paper_review(request: PaperReviewRequest):
     if not request.pdf_content or not request.pdf_content.strip():
         raise HTTPException(status_code=400, detail="PDF content cannot be empty")
     
-    return StreamingResponse(
-        generate_review_stream(request.query, request.pdf_content),
-        media_type="text/event-stream",
+    # 并发评阅已满时在开始流式输出前直接拒绝；相同请求正在进行时直接合并，不占用新的名额
+    key = _review_request_key(request.query, request.pdf_content)
+    if key not in _INFLIGHT_REVIEWS and _REVIEW_SEMAPHORE.locked():
+        raise HTTPException(status_code=429, detail="Too many concurrent reviews, please retry later")
+    
+    return EventSourceResponse(
+        coalesced_review_stream(key, request.query, request.pdf_content, http_request.app.state),
+        ping=SSE_PING_INTERVAL,
+        sep=SSE_SEP,
         headers={
             "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
             "Access-Control-Allow-Origin": "*"
         }
     )
@@ -836,35 +1182,27 @@ signal.signal(signal.SIGTERM, shutdown_handler)
 if __name__ == "__main__":
     import uvicorn
     
-    # 验证端口可用性
-    import socket
-    def check_port(port):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("0.0.0.0", port))
-                return True
-            except OSError:
-                return False
-    
-    if not check_port(3000):
-        print(f"❌ 端口3000已被占用，请检查是否有其他服务在使用")
-        sys.exit(1)
-    
     print("🚀 启动 FastAPI 服务...")
     print(f"📍 监听地址: http://0.0.0.0:3000")
     print(f"📝 健康检查: curl http://localhost:3000/health")
     print(f"📚 API文档: http://localhost:3000/docs")
     
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=3000,
-        log_level="info",
-        access_log=True,
-        reload=False,
-        workers=1,
-        loop="asyncio",
-        timeout_keep_alive=30,
-        limit_concurrency=100,
-    )
+    # 端口占用等绑定错误由uvicorn在监听时直接报告，不再预先探测（探测与绑定之间存在竞争）
+    try:
+        # 多进程需要以导入字符串形式传入应用；loop="auto" 在安装了uvloop时自动使用uvloop
+        uvicorn.run(
+            "api_service:app",
+            host="0.0.0.0",
+            port=3000,
+            log_level="info",
+            access_log=True,
+            reload=False,
+            workers=Config.SERVER_WORKERS,
+            loop="auto",
+            timeout_keep_alive=30,
+            limit_concurrency=100,
+        )
+    except OSError as e:
+        print(f"❌ 端口3000绑定失败，请检查是否有其他服务在使用: {e}")
+        sys.exit(1)
 
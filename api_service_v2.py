@@ -3,22 +3,30 @@ API服务 V2 - 基于大模型能力的论文评阅系统（不涉及文件检
 简化的4步流程：PDF解析 → 创新点分析 → 多维度评估 → 生成评阅报告
 """
 import os
-import json
 import time
+import queue
+import atexit
 import asyncio
-from typing import AsyncGenerator
-from fastapi import FastAPI, HTTPException
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, Optional
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 import signal
 import sys
+from dotenv import load_dotenv
+import orjson
 
 from config import Config
-from llm_client import LLMClient
+from llm_client import LLMClient, llm_cancel_event
 from pdf_parser import PDFParser
 from reviewer_v2 import ReviewerV2
-from prompt_template_v2 import detect_language
+from prompt_template_v2 import cached_detect_language
 
 
 def load_env_file(env_file: str):
@@ -29,15 +37,9 @@ def load_env_file(env_file: str):
     
     if os.path.exists(env_file):
         print(f"✓ 找到 .env 文件: {env_file}")
-        loaded_count = 0
-        with open(env_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value.strip('"\'')
-                    loaded_count += 1
-        print(f"✓ 成功加载 {loaded_count} 个环境变量")
+        # 使用python-dotenv解析（支持export前缀、引号转义、多行值），已存在的环境变量优先
+        load_dotenv(env_file, override=False, encoding='utf-8')
+        print(f"✓ 成功加载 .env 文件")
         return True
     else:
         print(f"⚠️ 警告: 未找到 .env 文件: {env_file}")
@@ -47,12 +49,34 @@ def load_env_file(env_file: str):
 # 加载环境变量
 load_env_file(".env")
 
+# 日志：记录先进入队列，由后台线程写出，stderr写入不阻塞事件循环
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler(), respect_handler_level=True)
+logger.addHandler(QueueHandler(_log_queue))
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：创建在所有请求间共享的LLM客户端、解析器与评阅器（均无请求级状态）"""
+    try:
+        app.state.llm_client = LLMClient()
+    except Exception as e:
+        raise RuntimeError(f"LLM客户端初始化失败: {e}") from e
+    app.state.pdf_parser = PDFParser(app.state.llm_client)
+    app.state.reviewer = ReviewerV2(app.state.llm_client)
+    yield
+
 # 创建FastAPI应用
 app = FastAPI(
     title="ICAIS2025-PaperReview API V2",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 @app.middleware("http")
@@ -62,16 +86,16 @@ async def simple_log_middleware(request, call_next):
     path = request.url.path
     
     if not path.startswith("/health"):
-        print(f"📥 [{time.strftime('%H:%M:%S')}] {request.method} {path}")
+        logger.info("📥 [%s] %s %s", time.strftime('%H:%M:%S'), request.method, path)
     
     try:
         response = await call_next(request)
         process_time = time.time() - start_time
         if not path.startswith("/health"):
-            print(f"📤 [{time.strftime('%H:%M:%S')}] {request.method} {path} - {response.status_code} ({process_time:.3f}s)")
+            logger.info("📤 [%s] %s %s - %s (%.3fs)", time.strftime('%H:%M:%S'), request.method, path, response.status_code, process_time)
         return response
     except Exception as e:
-        print(f"❌ [{time.strftime('%H:%M:%S')}] 错误: {request.method} {path} - {e}")
+        logger.error("❌ [%s] 错误: %s %s - %s", time.strftime('%H:%M:%S'), request.method, path, e)
         raise
 
 # 配置CORS
@@ -92,219 +116,280 @@ class PaperReviewRequest(BaseModel):
     pdf_content: str
 
 
-def format_sse_data(content: str) -> str:
-    """生成OpenAI格式的SSE数据"""
-    data = {
-        "object": "chat.completion.chunk",
-        "choices": [{
-            "delta": {
-                "content": content
-            }
-        }]
-    }
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+# 消息模板（4步流程，按语言区分），带参数的模板在调用处使用 str.format 填充
+_MSG_TEMPLATES_ZH = {
+    'step1': "### 📄 步骤 1/4: PDF解析与结构化提取\n\n✅ 已完成\n\n",
+    'step2': "### 💡 步骤 2/4: 创新点分析\n\n✅ 已完成\n\n",
+    'step3': "### ⭐ 步骤 3/4: 多维度深度评估\n\n✅ 已完成\n\n",
+    'step4': "### 📋 步骤 4/4: 生成评阅报告\n\n",
+    'error_config': "## ❌ 错误\n\n配置验证失败，请检查环境变量设置\n\n",
+    'error_config_exception': "## ❌ 错误\n\n配置验证异常: {e}\n\n",
+    'error_pdf_parse': "## ❌ 错误\n\nPDF解析失败，无法继续: {e}\n\n",
+    'error_analysis': "## ❌ 错误\n\n分析失败: {e}\n\n",
+    'error_review': "## ❌ 错误\n\n评阅报告生成失败: {e}\n\n",
+    'error_timeout': "## ❌ 超时错误\n\n请求处理超过 {t} 秒，已自动终止\n\n",
+    'error_general': "## ❌ 错误\n\n程序执行失败: {e}\n\n",
+    'pdf_timeout': "⚠️ PDF解析超时，使用备用方法提取基本信息\n\n",
+    'pdf_fallback': "基本信息提取完成\n\n",
+    'pdf_warning': "⚠️ PDF解析警告: {e}\n\n",
+    'error_pdf_no_text': "## ❌ 错误\n\nPDF解析失败，无法继续\n\n",
+    'innovation_timeout': "创新点分析超时，使用论文自身信息进行基本总结。",
+    'innovation_failed': "创新点分析失败: {e}",
+    'evaluation_timeout': "评估超时，使用论文自身信息进行基本评估。",
+    'evaluation_failed': "评估失败: {e}",
+    'review_progress': "🔄 正在生成评阅报告，请稍候...\n\n",
+    'review_empty': "⚠️ 评阅报告生成失败，返回空内容\n\n",
+    'error_review_timeout': "## ❌ 错误\n\n评阅报告生成超时\n\n"
+}
+
+_MSG_TEMPLATES_EN = {
+    'step1': "### 📄 Step 1/4: PDF Parsing and Structure Extraction\n\n✅ Completed\n\n",
+    'step2': "### 💡 Step 2/4: Innovation Analysis\n\n✅ Completed\n\n",
+    'step3': "### ⭐ Step 3/4: Multi-dimensional Deep Evaluation\n\n✅ Completed\n\n",
+    'step4': "### 📋 Step 4/4: Review Report Generation\n\n",
+    'error_config': "## ❌ Error\n\nConfiguration validation failed. Please check environment variables.\n\n",
+    'error_config_exception': "## ❌ Error\n\nConfiguration validation exception: {e}\n\n",
+    'error_pdf_parse': "## ❌ Error\n\nPDF parsing failed. Cannot continue: {e}\n\n",
+    'error_analysis': "## ❌ Error\n\nAnalysis failed: {e}\n\n",
+    'error_review': "## ❌ Error\n\nReview report generation failed: {e}\n\n",
+    'error_timeout': "## ❌ Timeout Error\n\nRequest processing exceeded {t} seconds. Automatically terminated.\n\n",
+    'error_general': "## ❌ Error\n\nProcess execution failed: {e}\n\n",
+    'pdf_timeout': "⚠️ PDF parsing timeout, using fallback method to extract basic information\n\n",
+    'pdf_fallback': "Basic information extraction completed\n\n",
+    'pdf_warning': "⚠️ PDF parsing warning: {e}\n\n",
+    'error_pdf_no_text': "## ❌ Error\n\nPDF parsing failed. Cannot continue.\n\n",
+    'innovation_timeout': "Innovation analysis timed out. Falling back to a basic summary from the paper itself.",
+    'innovation_failed': "Innovation analysis failed: {e}",
+    'evaluation_timeout': "Evaluation timed out. Falling back to a basic evaluation from the paper itself.",
+    'evaluation_failed': "Evaluation failed: {e}",
+    'review_progress': "🔄 Generating review report, please wait...\n\n",
+    'review_empty': "⚠️ Review report generation failed, returned empty content\n\n",
+    'error_review_timeout': "## ❌ Error\n\nReview report generation timeout\n\n"
+}
+
+
+# 流式输出正文时每个SSE帧携带的字符数
+STREAM_CHUNK_SIZE = 512
+
+# 备用方法保留的原始文本长度（与PDFParser.parse保留的raw_text一致）
+_FALLBACK_TEXT_CHARS = 10000
+
+
+# OpenAI格式数据帧的固定前后缀（预先编码），中间填入JSON转义后的content
+SSE_DATA_PREFIX = b'data: {"object":"chat.completion.chunk","choices":[{"delta":{"content":'
+SSE_DATA_SUFFIX = b'}}]}\n\n'
+
+# SSE结束标记帧
+SSE_DONE_FRAME = b"data: [DONE]\n\n"
 
-def format_sse_done() -> str:
+# ping注释帧的分隔符，与数据帧 "data: ...\n\n" 的格式保持一致
+SSE_SEP = "\n"
+
+# EventSourceResponse自动发送ping注释的间隔（秒），替代手动心跳
+SSE_PING_INTERVAL = 15
+
+
+def format_sse_data(content: str) -> bytes:
+    """生成OpenAI格式的SSE数据
+    
+    帧结构固定，只对content做JSON转义（orjson直接输出UTF-8字节，不转义非ASCII字符），
+    再拼接预编码的前后缀，EventSourceResponse直接写出字节。
+    """
+    return SSE_DATA_PREFIX + orjson.dumps(content) + SSE_DATA_SUFFIX
+
+def format_sse_done() -> bytes:
     """生成SSE结束标记"""
-    return "data: [DONE]\n\n"
+    return SSE_DONE_FRAME
 
-def stream_message(message: str, chunk_size: int = 1):
-    """将消息按字符流式输出（同步生成器）"""
+def stream_message(message: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """将消息按固定大小分块流式输出（同步生成器）
+
+    客户端按 delta.content 拼接内容，分块大小不影响最终结果；
+    逐字符发送会让每个字符都经历一次JSON序列化和一次网络写入。
+    """
     for i in range(0, len(message), chunk_size):
         chunk = message[i:i + chunk_size]
         yield format_sse_data(chunk)
 
 
-async def run_with_heartbeat(task_func, *args, heartbeat_interval=25, timeout=None, **kwargs):
+def _build_fallback_info(pdf_parser: PDFParser, pdf_bytes: Optional[bytes], error: str) -> Dict[str, str]:
+    """备用方法：结构化解析超时或失败时，直接提取PDF文本构造基本的结构化信息"""
+    if pdf_bytes is None:
+        raise ValueError("Base64解码失败")
+    # 备用方法只用到前10000字符，提取够了就不再处理后续页面
+    pdf_text = pdf_parser.extract_text_from_pdf(pdf_bytes, _FALLBACK_TEXT_CHARS)
+    structured_info = {
+        "raw_text": pdf_text[:_FALLBACK_TEXT_CHARS],
+        "Title": "",
+        "Abstract": pdf_text[:500] if len(pdf_text) > 0 else "",
+        "error": error
+    }
+    # 尝试从文本开头提取标题（第一个长度合适的行），否则取前100个字符
+    for line in pdf_text.split('\n', 10)[:10]:
+        line = line.strip()
+        if len(line) > 10 and len(line) < 200:
+            structured_info["Title"] = line
+            break
+    if not structured_info["Title"]:
+        structured_info["Title"] = pdf_text[:100].strip().replace('\n', ' ')
+    return structured_info
+
+
+async def _run_stage(task_func, *args, timeout=None, **kwargs):
     """
-    执行长时间任务，期间定期发送心跳数据
+    在线程中执行单个阶段并直接返回结果，超时则取消
+    
+    连接保活由EventSourceResponse的ping注释完成，阶段执行期间无需产出心跳数据。
     
     Args:
         task_func: 要执行的同步函数
         *args: 位置参数
-        heartbeat_interval: 心跳间隔（秒）
         timeout: 任务超时时间（秒），None表示不超时
         **kwargs: 关键字参数
+    
+    Returns:
+        任务结果
     """
-    import asyncio
-    start_time = time.time()
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(task_func, *args, **kwargs), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
+
+
+async def stream_in_thread(gen_func, *args, timeout=None, **kwargs):
+    """
+    在线程中迭代同步生成器，逐段转发其输出
     
-    # 创建任务
-    task = asyncio.create_task(asyncio.to_thread(task_func, *args, **kwargs))
+    Args:
+        gen_func: 返回同步生成器的函数
+        *args: 位置参数
+        timeout: 整体超时时间（秒），None表示不超时
+        **kwargs: 关键字参数
     
-    # 定期发送心跳
-    while not task.done():
-        await asyncio.sleep(heartbeat_interval)
-        
-        # 检查超时
-        if timeout is not None:
-            elapsed = time.time() - start_time
-            if elapsed > timeout:
-                task.cancel()
-                raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
-        
-        # 发送心跳（空内容）
-        yield format_sse_data("")
+    Yields:
+        生成器产出的片段
+    """
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+    stop = threading.Event()
+    
+    def _put(item):
+        try:
+            loop.call_soon_threadsafe(pieces.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭
+            stop.set()
+    
+    def _produce():
+        gen = gen_func(*args, **kwargs)
+        try:
+            for piece in gen:
+                if stop.is_set():
+                    return
+                _put(("PIECE", piece))
+            _put(("END", None))
+        except Exception as e:
+            _put(("ERROR", e))
+        finally:
+            gen.close()
     
-    # 返回结果
+    # run_in_executor 不会复制上下文，显式带上（LLM取消标志通过上下文传递）
+    loop.run_in_executor(None, contextvars.copy_context().run, _produce)
+    deadline = None if timeout is None else time.time() + timeout
     try:
-        result = await task
-        yield ("RESULT", result)
-    except Exception as e:
-        raise e
+        while True:
+            remaining = None if deadline is None else deadline - time.time()
+            try:
+                kind, value = await asyncio.wait_for(pieces.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"任务执行超过 {timeout} 秒，已取消")
+            if kind == "END":
+                break
+            if kind == "ERROR":
+                raise value
+            yield value
+    finally:
+        # 提前结束（超时、客户端断开）时通知线程停止消费LLM流
+        stop.set()
 
 
-async def _generate_review_internal_v2(query: str, pdf_content: str) -> AsyncGenerator[str, None]:
-    """内部生成器函数，执行实际的评阅逻辑 V2（4步流程）"""
+async def _generate_review_internal_v2(query: str, pdf_content: str, state) -> AsyncGenerator[bytes, None]:
+    """内部生成器函数，执行实际的评阅逻辑 V2（4步流程），共享组件从 app.state 获取"""
     start_time = time.time()
+    # 语言只检测一次，正常流程与错误分支共用（检测失败时回退为英文）
+    language = 'en'
     
     try:
         # 先检测语言，用于后续消息模板
-        language = await asyncio.to_thread(detect_language, query)
+        language = cached_detect_language(query)
         
-        # 根据语言设置消息模板（4步流程）
-        if language == 'zh':
-            msg_templates = {
-                'step1': "### 📄 步骤 1/4: PDF解析与结构化提取\n\n✅ 已完成\n\n",
-                'step2': "### 💡 步骤 2/4: 创新点分析\n\n✅ 已完成\n\n",
-                'step3': "### ⭐ 步骤 3/4: 多维度深度评估\n\n✅ 已完成\n\n",
-                'step4': "### 📋 步骤 4/4: 生成评阅报告\n\n",
-                'error_config': "## ❌ 错误\n\n配置验证失败，请检查环境变量设置\n\n",
-                'error_config_exception': lambda e: f"## ❌ 错误\n\n配置验证异常: {e}\n\n",
-                'error_llm_init': lambda e: f"## ❌ 错误\n\nLLM客户端初始化失败: {e}\n\n",
-                'error_pdf_parse': lambda e: f"## ❌ 错误\n\nPDF解析失败，无法继续: {e}\n\n",
-                'error_analysis': lambda e: f"## ❌ 错误\n\n分析失败: {e}\n\n",
-                'error_review': lambda e: f"## ❌ 错误\n\n评阅报告生成失败: {e}\n\n",
-                'error_timeout': lambda t: f"## ❌ 超时错误\n\n请求处理超过 {t} 秒，已自动终止\n\n",
-                'error_general': lambda e: f"## ❌ 错误\n\n程序执行失败: {e}\n\n",
-                'pdf_timeout': "⚠️ PDF解析超时，使用备用方法提取基本信息\n\n",
-                'pdf_fallback': "基本信息提取完成\n\n",
-                'pdf_warning': lambda e: f"⚠️ PDF解析警告: {e}\n\n"
-            }
-        else:
-            msg_templates = {
-                'step1': "### 📄 Step 1/4: PDF Parsing and Structure Extraction\n\n✅ Completed\n\n",
-                'step2': "### 💡 Step 2/4: Innovation Analysis\n\n✅ Completed\n\n",
-                'step3': "### ⭐ Step 3/4: Multi-dimensional Deep Evaluation\n\n✅ Completed\n\n",
-                'step4': "### 📋 Step 4/4: Review Report Generation\n\n",
-                'error_config': "## ❌ Error\n\nConfiguration validation failed. Please check environment variables.\n\n",
-                'error_config_exception': lambda e: f"## ❌ Error\n\nConfiguration validation exception: {e}\n\n",
-                'error_llm_init': lambda e: f"## ❌ Error\n\nLLM client initialization failed: {e}\n\n",
-                'error_pdf_parse': lambda e: f"## ❌ Error\n\nPDF parsing failed. Cannot continue: {e}\n\n",
-                'error_analysis': lambda e: f"## ❌ Error\n\nAnalysis failed: {e}\n\n",
-                'error_review': lambda e: f"## ❌ Error\n\nReview report generation failed: {e}\n\n",
-                'error_timeout': lambda t: f"## ❌ Timeout Error\n\nRequest processing exceeded {t} seconds. Automatically terminated.\n\n",
-                'error_general': lambda e: f"## ❌ Error\n\nProcess execution failed: {e}\n\n",
-                'pdf_timeout': "⚠️ PDF parsing timeout, using fallback method to extract basic information\n\n",
-                'pdf_fallback': "Basic information extraction completed\n\n",
-                'pdf_warning': lambda e: f"⚠️ PDF parsing warning: {e}\n\n"
-            }
+        # 根据语言选择消息模板（模块级常量，避免每个请求重复构建）
+        msg_templates = _MSG_TEMPLATES_ZH if language == 'zh' else _MSG_TEMPLATES_EN
     
         # 验证配置
         try:
-            config_valid = await asyncio.to_thread(Config.validate_config)
+            config_valid = Config.validate_config()
             if not config_valid:
                 for chunk in stream_message(msg_templates['error_config']):
                     yield chunk
                 return
         except Exception as e:
-            for chunk in stream_message(msg_templates['error_config_exception'](e)):
+            for chunk in stream_message(msg_templates['error_config_exception'].format(e=e)):
                 yield chunk
             return
     
-        # 创建组件
-        try:
-            llm_client = LLMClient()
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_llm_init'](e)):
-                yield chunk
-            return
-    
-        # 创建解析器和评阅器
-        pdf_parser = PDFParser(llm_client)
-        reviewer = ReviewerV2(llm_client)
+        # 共享的解析器和评阅器（应用启动时创建）
+        pdf_parser = state.pdf_parser
+        reviewer = state.reviewer
         
         # 步骤1: PDF解析
         structured_info = None
+        
+        # Base64只解码一次，解析与备用方法共用；解码失败时交给parse按原流程返回错误信息
+        try:
+            pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
+        except ValueError:
+            pdf_bytes = None
+        
+        fallback_error = None
         try:
             parse_timeout = Config.PDF_PARSE_TIMEOUT * 2
-            heartbeat_interval = 15
-            async for item in run_with_heartbeat(
+            structured_info = await _run_stage(
                 pdf_parser.parse,
-                pdf_content,
+                pdf_bytes if pdf_bytes is not None else pdf_content,
                 parse_timeout,
                 language,
-                heartbeat_interval=heartbeat_interval,
                 timeout=parse_timeout + 10
-            ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    structured_info = item[1]
-                    break
-                else:
-                    yield item
+            )
         except asyncio.TimeoutError:
+            fallback_error = "PDF结构化解析超时，已使用备用方法提取基本信息"
+        except Exception as e:
+            logger.exception("PDF解析失败")
+            fallback_error = f"PDF解析失败: {str(e)}"
+        
+        if fallback_error is not None:
+            # 超时与异常共用同一备用方法：直接提取文本构造基本信息
             for chunk in stream_message(msg_templates['pdf_timeout']):
                 yield chunk
             try:
-                pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
-                pdf_text = await asyncio.to_thread(pdf_parser.extract_text_from_pdf, pdf_bytes)
-                structured_info = {
-                    "raw_text": pdf_text[:10000],
-                    "Title": "",
-                    "Abstract": pdf_text[:500] if len(pdf_text) > 0 else "",
-                    "error": "PDF结构化解析超时，已使用备用方法提取基本信息"
-                }
-                lines = pdf_text.split('\n')
-                for line in lines[:10]:
-                    line = line.strip()
-                    if len(line) > 10 and len(line) < 200:
-                        structured_info["Title"] = line
-                        break
-                if not structured_info["Title"]:
-                    structured_info["Title"] = pdf_text[:100].strip().replace('\n', ' ')
-                for chunk in stream_message(msg_templates['pdf_fallback']):
-                    yield chunk
+                structured_info = await asyncio.to_thread(_build_fallback_info, pdf_parser, pdf_bytes, fallback_error)
             except Exception as e:
-                for chunk in stream_message(msg_templates['error_pdf_parse'](e)):
-                    yield chunk
-                return
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            try:
-                pdf_bytes = await asyncio.to_thread(pdf_parser.decode_base64_pdf, pdf_content)
-                pdf_text = await asyncio.to_thread(pdf_parser.extract_text_from_pdf, pdf_bytes)
-                structured_info = {
-                    "raw_text": pdf_text[:10000],
-                    "Title": pdf_text[:100].strip().replace('\n', ' ') if pdf_text else "",
-                    "Abstract": pdf_text[:500] if len(pdf_text) > 0 else "",
-                    "error": f"PDF解析失败: {str(e)}"
-                }
-                for chunk in stream_message(msg_templates['pdf_timeout']):
-                    yield chunk
-                for chunk in stream_message(msg_templates['pdf_fallback']):
-                    yield chunk
-            except Exception as e2:
-                for chunk in stream_message(msg_templates['error_pdf_parse'](e2)):
+                for chunk in stream_message(msg_templates['error_pdf_parse'].format(e=e)):
                     yield chunk
                 return
+            for chunk in stream_message(msg_templates['pdf_fallback']):
+                yield chunk
         
         if structured_info is None:
-            for chunk in stream_message(msg_templates['error_pdf_parse']("PDF parsing returned empty result")):
+            for chunk in stream_message(msg_templates['error_pdf_parse'].format(e="PDF parsing returned empty result")):
                 yield chunk
             return
         
         if "error" in structured_info:
-            for chunk in stream_message(msg_templates['pdf_warning'](structured_info.get('error'))):
+            for chunk in stream_message(msg_templates['pdf_warning'].format(e=structured_info.get('error'))):
                 yield chunk
             if not structured_info.get("raw_text"):
-                if language == 'zh':
-                    error_msg = "## ❌ 错误\n\nPDF解析失败，无法继续\n\n"
-                else:
-                    error_msg = "## ❌ Error\n\nPDF parsing failed. Cannot continue.\n\n"
-                for chunk in stream_message(error_msg):
+                for chunk in stream_message(msg_templates['error_pdf_no_text']):
                     yield chunk
                 return
         
@@ -312,72 +397,46 @@ async def _generate_review_internal_v2(query: str, pdf_content: str) -> AsyncGen
         for chunk in stream_message(msg_templates['step1']):
             yield chunk
         
-        # 步骤2: 创新点分析
+        # 步骤2/3: 创新点分析与多维度评估互不依赖，并行执行
+        # （评估不再等待创新点分析结果，两者均在步骤4中汇总给报告生成）
+        analysis_timeout = Config.SEMANTIC_ANALYSIS_TIMEOUT
+        evaluation_timeout = Config.EVALUATION_TIMEOUT
+        innovation_task = asyncio.create_task(_run_stage(
+            reviewer.analyze_innovation, structured_info, analysis_timeout, language,
+            timeout=analysis_timeout + 10
+        ))
+        evaluation_task = asyncio.create_task(_run_stage(
+            reviewer.evaluate, structured_info, "", evaluation_timeout, language,
+            timeout=evaluation_timeout + 10
+        ))
+        try:
+            await asyncio.wait({innovation_task, evaluation_task})
+        finally:
+            # 客户端断开等情况下取消尚未完成的任务
+            innovation_task.cancel()
+            evaluation_task.cancel()
+        
         innovation_analysis = ""
         try:
-            analysis_timeout = Config.SEMANTIC_ANALYSIS_TIMEOUT
-            heartbeat_interval = 15
-            async for item in run_with_heartbeat(
-                reviewer.analyze_innovation,
-                structured_info,
-                analysis_timeout,
-                language,
-                heartbeat_interval=heartbeat_interval,
-                timeout=analysis_timeout + 10
-            ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    innovation_analysis = item[1] or ""
-                    break
-                else:
-                    yield item
+            innovation_analysis = innovation_task.result() or ""
         except asyncio.TimeoutError:
-            if language == 'zh':
-                innovation_analysis = "创新点分析超时，使用论文自身信息进行基本总结。"
-            else:
-                innovation_analysis = "Innovation analysis timed out. Falling back to a basic summary from the paper itself."
+            innovation_analysis = msg_templates['innovation_timeout']
         except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            if language == 'zh':
-                innovation_analysis = f"创新点分析失败: {str(e)}"
-            else:
-                innovation_analysis = f"Innovation analysis failed: {str(e)}"
+            logger.exception("创新点分析失败")
+            innovation_analysis = msg_templates['innovation_failed'].format(e=e)
         
         # 输出步骤2完成
         for chunk in stream_message(msg_templates['step2']):
             yield chunk
         
-        # 步骤3: 多维度评估
         evaluation = ""
         try:
-            evaluation_timeout = Config.EVALUATION_TIMEOUT
-            heartbeat_interval = 15
-            async for item in run_with_heartbeat(
-                reviewer.evaluate,
-                structured_info,
-                innovation_analysis,
-                evaluation_timeout,
-                language,
-                heartbeat_interval=heartbeat_interval,
-                timeout=evaluation_timeout + 10
-            ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    evaluation = item[1] or ""
-                    break
-                else:
-                    yield item
+            evaluation = evaluation_task.result() or ""
         except asyncio.TimeoutError:
-            if language == 'zh':
-                evaluation = "评估超时，使用论文自身信息进行基本评估。"
-            else:
-                evaluation = "Evaluation timed out. Falling back to a basic evaluation from the paper itself."
+            evaluation = msg_templates['evaluation_timeout']
         except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            if language == 'zh':
-                evaluation = f"评估失败: {str(e)}"
-            else:
-                evaluation = f"Evaluation failed: {str(e)}"
+            logger.exception("多维度评估失败")
+            evaluation = msg_templates['evaluation_failed'].format(e=e)
         
         # 输出步骤3完成
         for chunk in stream_message(msg_templates['step3']):
@@ -387,91 +446,78 @@ async def _generate_review_internal_v2(query: str, pdf_content: str) -> AsyncGen
         for chunk in stream_message(msg_templates['step4']):
             yield chunk
         
-        if language == 'zh':
-            progress_msg = "🔄 正在生成评阅报告，请稍候...\n\n"
-        else:
-            progress_msg = "🔄 Generating review report, please wait...\n\n"
-        for chunk in stream_message(progress_msg):
+        for chunk in stream_message(msg_templates['review_progress']):
             yield chunk
         
         try:
-            review = None
-            async for item in run_with_heartbeat(
-                reviewer.generate_review,
+            # LLM输出的片段到达即转发，无需等待完整报告
+            review_started = False
+            async for piece in stream_in_thread(
+                reviewer.generate_review_stream,
                 structured_info,
                 evaluation,
                 innovation_analysis,
                 Config.REPORT_GENERATION_TIMEOUT,
                 language,
-                heartbeat_interval=25,
                 timeout=Config.REPORT_GENERATION_TIMEOUT + 20
             ):
-                if isinstance(item, tuple) and len(item) == 2 and item[0] == "RESULT":
-                    review = item[1]
-                    break
-                else:
-                    yield item
+                review_started = True
+                yield format_sse_data(piece)
             
-            if not review or review.strip() == "":
-                if language == 'zh':
-                    error_msg = "⚠️ 评阅报告生成失败，返回空内容\n\n"
-                else:
-                    error_msg = "⚠️ Review report generation failed, returned empty content\n\n"
-                for chunk in stream_message(error_msg):
+            if not review_started:
+                for chunk in stream_message(msg_templates['review_empty']):
                     yield chunk
             else:
-                # 流式输出评阅报告
-                for chunk in stream_message(f"{review}\n\n"):
-                    yield chunk
+                yield format_sse_data("\n\n")
         except asyncio.TimeoutError:
-            if language == 'zh':
-                error_msg = "## ❌ 错误\n\n评阅报告生成超时\n\n"
-            else:
-                error_msg = "## ❌ Error\n\nReview report generation timeout\n\n"
-            for chunk in stream_message(error_msg):
+            for chunk in stream_message(msg_templates['error_review_timeout']):
                 yield chunk
             return
         except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            for chunk in stream_message(msg_templates['error_review'](e)):
+            logger.exception("评阅报告生成失败")
+            for chunk in stream_message(msg_templates['error_review'].format(e=e)):
                 yield chunk
             return
     
         elapsed = time.time() - start_time
     
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ [_generate_review_internal_v2] 未捕获的异常: {e}\n{error_trace}")
+        logger.exception("❌ [_generate_review_internal_v2] 未捕获的异常: %s", e)
         try:
-            try:
-                language = await asyncio.to_thread(detect_language, query)
-            except:
-                language = 'en'
-            
-            if language == 'zh':
-                error_msg = f"## ❌ 错误\n\n程序执行失败: {e}\n\n"
-            else:
-                error_msg = f"## ❌ Error\n\nProcess execution failed: {e}\n\n"
-            for chunk in stream_message(error_msg):
+            msg_templates = _MSG_TEMPLATES_ZH if language == 'zh' else _MSG_TEMPLATES_EN
+            for chunk in stream_message(msg_templates['error_general'].format(e=e)):
                 yield chunk
         except:
             pass
+
+
+async def generate_review_stream_v2(query: str, pdf_content: str, state) -> AsyncGenerator[bytes, None]:
+    """评阅流式输出生成器：转发内部生成器的输出，结束（含出错提前返回）后发送结束标记
+
+    结束标记不放在 finally 中：客户端断开时EventSourceResponse会关闭生成器，此时不能再yield。
+    """
+    # 本请求的LLM取消标志，工作线程中的LLM调用通过上下文读取
+    cancel_event = threading.Event()
+    llm_cancel_event.set(cancel_event)
+    try:
+        async for item in _generate_review_internal_v2(query, pdf_content, state):
+            yield item
     finally:
-        # 发送结束标记
-        yield format_sse_done()
+        # 客户端断开（生成器被关闭或取消）时通知仍在工作线程中的LLM调用中止
+        cancel_event.set()
+    yield format_sse_done()
 
 
 @app.post("/paper_review")
-async def paper_review(request: PaperReviewRequest):
+async def paper_review(request: PaperReviewRequest, http_request: Request):
     """
     论文评阅端点 V2 - 基于大模型能力，不涉及文件检索
     """
     try:
-        return StreamingResponse(
-            _generate_review_internal_v2(request.query, request.pdf_content),
-            media_type="text/event-stream",
+        return EventSourceResponse(
+            generate_review_stream_v2(request.query, request.pdf_content, http_request.app.state),
+            ping=SSE_PING_INTERVAL,
+            sep=SSE_SEP,
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
@@ -513,35 +559,27 @@ signal.signal(signal.SIGTERM, shutdown_handler)
 if __name__ == "__main__":
     import uvicorn
     
-    # 验证端口可用性
-    import socket
-    def check_port(port):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            try:
-                s.bind(("0.0.0.0", port))
-                return True
-            except OSError:
-                return False
-    
-    if not check_port(3000):
-        print(f"❌ 端口3000已被占用，请检查是否有其他服务在使用")
-        sys.exit(1)
-    
     print("🚀 启动 FastAPI 服务 V2...")
     print(f"📍 监听地址: http://0.0.0.0:3000")
     print(f"📝 健康检查: curl http://localhost:3000/health")
     print(f"📚 API文档: http://localhost:3000/docs")
     
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=3000,
-        log_level="info",
-        access_log=True,
-        reload=False,
-        workers=1,
-        loop="asyncio",
-        timeout_keep_alive=30,
-        limit_concurrency=100,
-    )
+    # 端口占用等绑定错误由uvicorn在监听时直接报告，不再预先探测（探测与绑定之间存在竞争）
+    try:
+        # 多进程需要以导入字符串形式传入应用；loop="auto" 在安装了uvloop时自动使用uvloop
+        uvicorn.run(
+            "api_service_v2:app",
+            host="0.0.0.0",
+            port=3000,
+            log_level="info",
+            access_log=True,
+            reload=False,
+            workers=Config.SERVER_WORKERS,
+            loop="auto",
+            timeout_keep_alive=30,
+            limit_concurrency=100,
+        )
+    except OSError as e:
+        print(f"❌ 端口3000绑定失败，请检查是否有其他服务在使用: {e}")
+        sys.exit(1)
 
@@ -2,16 +2,123 @@ import os
 from typing import Optional, Any
 
 
+def _to_bool(value: str) -> bool:
+    return value.strip().lower() in ("true", "1", "yes", "on")
+
+
+# 配置表：属性名 -> (环境变量名（新名在前、旧名fallback在后）, 默认值, 类型转换)
+_CONFIG_SPECS = {
+    # LLM服务配置（适配新的环境变量名称）
+    "LLM_API_ENDPOINT": (("SCI_MODEL_BASE_URL", "LLM_API_ENDPOINT"), None, None),
+    "LLM_API_KEY": (("SCI_MODEL_API_KEY", "LLM_API_KEY"), None, None),
+    "LLM_MODEL": (("SCI_LLM_MODEL", "LLM_MODEL"), "xxx", None),
+    "LLM_REASONING_MODEL": (("SCI_LLM_REASONING_MODEL",), None, None),
+    "LLM_REQUEST_TIMEOUT": (("LLM_REQUEST_TIMEOUT",), "120", int),
+    
+    # 应用配置
+    "APP_ENV": (("APP_ENV",), "dev", None),
+    "DEBUG": (("DEBUG",), "True", _to_bool),
+    
+    # LLM请求配置
+    "DEFAULT_TEMPERATURE": (("DEFAULT_TEMPERATURE",), "0.6", float),
+    "MAX_RETRIES": (("MAX_RETRIES",), "3", int),
+    
+    # 论文检索配置
+    "MAX_PAPERS_PER_QUERY": (("MAX_PAPERS_PER_QUERY",), "5", int),
+    "MAX_TOTAL_PAPERS": (("MAX_TOTAL_PAPERS",), "10", int),
+    "SEMANTIC_SCHOLAR_TIMEOUT": (("SEMANTIC_SCHOLAR_TIMEOUT",), "30", int),
+    "SEMANTIC_SCHOLAR_MAX_RETRIES": (("SEMANTIC_SCHOLAR_MAX_RETRIES",), "10", int),
+    
+    # Embedding配置
+    "EMBEDDING_MODEL_NAME": (("SCI_EMBEDDING_MODEL", "EMBEDDING_MODEL_NAME"), "xxx", None),
+    "EMBEDDING_API_ENDPOINT": (("SCI_EMBEDDING_BASE_URL", "EMBEDDING_API_ENDPOINT"), None, None),
+    "EMBEDDING_API_KEY": (("SCI_EMBEDDING_API_KEY", "EMBEDDING_API_KEY"), None, None),
+    "EMBEDDING_DEVICE": (("EMBEDDING_DEVICE",), "cpu", None),
+    "EMBEDDING_BATCH_SIZE": (("EMBEDDING_BATCH_SIZE",), "64", int),  # 单次请求的最大文本数，按服务商限制配置
+    "EMBEDDING_MAX_WORKERS": (("EMBEDDING_MAX_WORKERS",), "8", int),  # 批量请求不可用时逐条请求的并发数
+    "EMBEDDING_CACHE": (("SCI_EMBEDDING_CACHE", "EMBEDDING_CACHE"), "false", _to_bool),  # 是否按 (模型, 文本) 落盘缓存embedding（默认关闭）
+    "EMBEDDING_CACHE_DIR": (("EMBEDDING_CACHE_DIR",), "~/.cache/sci-embeddings", None),
+    "EMBEDDING_CACHE_MAX_ENTRIES": (("EMBEDDING_CACHE_MAX_ENTRIES",), "20000", int),  # 磁盘上最多保留的向量条数（1024维约80MB）
+    
+    # 论文评阅配置
+    "REVIEW_TIMEOUT": (("REVIEW_TIMEOUT",), "1200", int),  # 20分钟总超时
+    "PDF_PARSE_TIMEOUT": (("PDF_PARSE_TIMEOUT",), "180", int),  # 3分钟
+    "KEY_EXTRACTION_TIMEOUT": (("KEY_EXTRACTION_TIMEOUT",), "120", int),  # 2分钟
+    "RETRIEVAL_TIMEOUT": (("RETRIEVAL_TIMEOUT",), "180", int),  # 3分钟
+    "SEMANTIC_ANALYSIS_TIMEOUT": (("SEMANTIC_ANALYSIS_TIMEOUT",), "180", int),  # 3分钟
+    "EVALUATION_TIMEOUT": (("EVALUATION_TIMEOUT",), "480", int),  # 8分钟
+    "REPORT_GENERATION_TIMEOUT": (("REPORT_GENERATION_TIMEOUT",), "240", int),  # 4分钟
+    
+    # 并发控制配置
+    "MAX_CONCURRENT_REVIEWS": (("MAX_CONCURRENT_REVIEWS",), "8", int),
+    "LLM_MAX_CONCURRENCY": (("LLM_MAX_CONCURRENCY",), "16", int),  # 进程内同时进行的LLM请求上限，按服务商并发限制配置
+    "EMBEDDING_MAX_CONCURRENCY": (("EMBEDDING_MAX_CONCURRENCY",), "16", int),  # 进程内同时进行的Embedding请求上限
+    
+    # 执行器配置
+    "THREAD_POOL_WORKERS": (("THREAD_POOL_WORKERS",), "32", int),  # asyncio默认线程池大小（to_thread使用）
+    "PROCESS_POOL_WORKERS": (("PROCESS_POOL_WORKERS",), str(os.cpu_count() or 1), int),  # CPU密集型辅助函数的进程池大小
+    # uvicorn工作进程数，默认单进程。并发限制（MAX_CONCURRENT_REVIEWS、LLM/EMBEDDING_MAX_CONCURRENCY）、
+    # 请求合并、内存缓存与进程池均按进程独立：启用多进程时总并发与进程数都会乘以进程数，
+    # 需将上述并发上限与 PROCESS_POOL_WORKERS 相应除以工作进程数（LLM总并发不得超过服务商限制）
+    "SERVER_WORKERS": (("SERVER_WORKERS",), "1", int),
+    
+    # 评阅结果缓存配置
+    "REVIEW_CACHE_TTL": (("REVIEW_CACHE_TTL",), "300", int),  # 5分钟
+    "REVIEW_CACHE_MAX_ENTRIES": (("REVIEW_CACHE_MAX_ENTRIES",), "128", int),
+    "REVIEW_CACHE_SIMILARITY_THRESHOLD": (("REVIEW_CACHE_SIMILARITY_THRESHOLD",), "0.87", float),
+    "STAGE_CACHE_DIR": (("STAGE_CACHE_DIR",), "/tmp/review_cache", None),
+    "STAGE_CACHE_MAX_ENTRIES": (("STAGE_CACHE_MAX_ENTRIES",), "256", int),  # 内存中的条目数
+    "STAGE_CACHE_TTL": (("STAGE_CACHE_TTL",), "86400", int),  # 落盘文件存活时间（秒），默认1天
+    "STAGE_CACHE_MAX_FILES": (("STAGE_CACHE_MAX_FILES",), "1024", int),  # 磁盘上最多保留的条目文件数
+}
+
+# 必需配置：未设置（或为空）时访问直接报错
+_REQUIRED_CONFIGS = {
+    "LLM_REASONING_MODEL": "SCI_LLM_REASONING_MODEL环境变量未设置，请配置推理模型",
+}
+
+
 class ConfigMeta(type):
     """元类，用于实现类级别的__getattr__"""
     
     def __getattr__(cls, name: str) -> Any:
-        """动态获取配置属性"""
-        return cls._get_config_value(name)
+        """动态获取配置属性
+
+        首次访问时按配置表解析环境变量，结果写回为类属性，之后的访问走普通属性查找，
+        不再经过__getattr__。必需变量未设置时记录下来，之后的访问直接报错，不再读取环境变量。
+        """
+        if name.startswith('_'):
+            raise AttributeError(f"'{cls.__name__}' object has no attribute '{name}'")
+        if name in cls._missing_required:
+            raise ValueError(_REQUIRED_CONFIGS[name])
+        value = cls._get_config_value(name)
+        type.__setattr__(cls, name, value)
+        cls._cached_names.add(name)
+        return value
 
 
 class Config(metaclass=ConfigMeta):
-    """应用配置类 - 使用元类实现延迟读取环境变量"""
+    """应用配置类 - 使用元类实现延迟读取环境变量（首次读取后缓存）"""
+
+    # 已缓存为类属性的配置名，reload() 时清除
+    _cached_names = set()
+    # 已确认未设置的必需配置名，reload() 时清除
+    _missing_required = set()
+
+    # 配置校验是否已通过（每个进程只需校验一次），reload() 时重置
+    _validated = False
+
+    @classmethod
+    def reload(cls):
+        """清除已缓存的配置值，下次访问时重新读取环境变量（修改环境变量后调用）"""
+        for name in list(cls._cached_names):
+            try:
+                type.__delattr__(cls, name)
+            except AttributeError:
+                pass
+        cls._cached_names.clear()
+        cls._missing_required.clear()
+        cls._validated = False
 
     @staticmethod
     def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
@@ -25,79 +132,30 @@ class Config(metaclass=ConfigMeta):
 
     @classmethod
     def _get_config_value(cls, name: str) -> Any:
-        """动态获取配置属性"""
-        # LLM服务配置（适配新的环境变量名称）
-        if name == "LLM_API_ENDPOINT":
-            return cls._get_env_with_fallback("SCI_MODEL_BASE_URL", "LLM_API_ENDPOINT")
-        elif name == "LLM_API_KEY":
-            return cls._get_env_with_fallback("SCI_MODEL_API_KEY", "LLM_API_KEY")
-        elif name == "LLM_MODEL":
-            return cls._get_env_with_fallback("SCI_LLM_MODEL", "LLM_MODEL", "xxx")
-        elif name == "LLM_REASONING_MODEL":
-            reasoning_model = cls._get_env("SCI_LLM_REASONING_MODEL")
-            if not reasoning_model:
-                raise ValueError("SCI_LLM_REASONING_MODEL环境变量未设置，请配置推理模型")
-            return reasoning_model
-        elif name == "LLM_REQUEST_TIMEOUT":
-            return int(cls._get_env("LLM_REQUEST_TIMEOUT", "120"))
-        
-        # 应用配置
-        elif name == "APP_ENV":
-            return cls._get_env("APP_ENV", "dev")
-        elif name == "DEBUG":
-            return cls._get_env("DEBUG", "True").lower() == "true"
-        
-        # LLM请求配置
-        elif name == "DEFAULT_TEMPERATURE":
-            return float(cls._get_env("DEFAULT_TEMPERATURE", "0.6"))
-        elif name == "MAX_RETRIES":
-            return int(cls._get_env("MAX_RETRIES", "3"))
-        
-        # 论文检索配置
-        elif name == "MAX_PAPERS_PER_QUERY":
-            return int(cls._get_env("MAX_PAPERS_PER_QUERY", "5"))
-        elif name == "MAX_TOTAL_PAPERS":
-            return int(cls._get_env("MAX_TOTAL_PAPERS", "10"))
-        elif name == "SEMANTIC_SCHOLAR_TIMEOUT":
-            return int(cls._get_env("SEMANTIC_SCHOLAR_TIMEOUT", "30"))
-        elif name == "SEMANTIC_SCHOLAR_MAX_RETRIES":
-            return int(cls._get_env("SEMANTIC_SCHOLAR_MAX_RETRIES", "10"))
-        
-        # Embedding配置
-        elif name == "EMBEDDING_MODEL_NAME":
-            return cls._get_env_with_fallback("SCI_EMBEDDING_MODEL", "EMBEDDING_MODEL_NAME", "xxx")
-        elif name == "EMBEDDING_API_ENDPOINT":
-            return cls._get_env_with_fallback("SCI_EMBEDDING_BASE_URL", "EMBEDDING_API_ENDPOINT")
-        elif name == "EMBEDDING_API_KEY":
-            return cls._get_env_with_fallback("SCI_EMBEDDING_API_KEY", "EMBEDDING_API_KEY")
-        elif name == "EMBEDDING_DEVICE":
-            return cls._get_env("EMBEDDING_DEVICE", "cpu")
-        
-        # 论文评阅配置
-        elif name == "REVIEW_TIMEOUT":
-            return int(cls._get_env("REVIEW_TIMEOUT", "1200"))  # 20分钟总超时
-        elif name == "PDF_PARSE_TIMEOUT":
-            return int(cls._get_env("PDF_PARSE_TIMEOUT", "180"))  # 3分钟
-        elif name == "KEY_EXTRACTION_TIMEOUT":
-            return int(cls._get_env("KEY_EXTRACTION_TIMEOUT", "120"))  # 2分钟
-        elif name == "RETRIEVAL_TIMEOUT":
-            return int(cls._get_env("RETRIEVAL_TIMEOUT", "180"))  # 3分钟
-        elif name == "SEMANTIC_ANALYSIS_TIMEOUT":
-            return int(cls._get_env("SEMANTIC_ANALYSIS_TIMEOUT", "180"))  # 3分钟
-        elif name == "EVALUATION_TIMEOUT":
-            return int(cls._get_env("EVALUATION_TIMEOUT", "480"))  # 8分钟
-        elif name == "REPORT_GENERATION_TIMEOUT":
-            return int(cls._get_env("REPORT_GENERATION_TIMEOUT", "240"))  # 4分钟
-        
-        # 如果属性不存在，抛出AttributeError
-        raise AttributeError(f"'{cls.__name__}' object has no attribute '{name}'")
+        """按配置表解析单个配置属性（由元类在首次访问时调用）"""
+        spec = _CONFIG_SPECS.get(name)
+        if spec is None:
+            # 如果属性不存在，抛出AttributeError
+            raise AttributeError(f"'{cls.__name__}' object has no attribute '{name}'")
+        keys, default, caster = spec
+        if len(keys) == 1:
+            raw = cls._get_env(keys[0], default)
+        else:
+            raw = cls._get_env_with_fallback(keys[0], keys[1], default)
+        if not raw and name in _REQUIRED_CONFIGS:
+            cls._missing_required.add(name)
+            raise ValueError(_REQUIRED_CONFIGS[name])
+        return raw if caster is None or raw is None else caster(raw)
 
     @classmethod
     def validate_config(cls) -> bool:
-        """验证配置是否正确"""
+        """验证配置是否正确（通过后结果缓存，后续调用直接返回）"""
+        if cls._validated:
+            return True
         if not cls.LLM_API_ENDPOINT or not cls.LLM_API_KEY:
             print("❌ LLM_API_ENDPOINT 或 LLM_API_KEY 未配置")
             return False
+        cls._validated = True
         return True
 
     @classmethod
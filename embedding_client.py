@@ -1,21 +1,48 @@
 """
 Embedding客户端 - 通过API调用embedding模型
 """
-from openai import OpenAI
+import functools
 import os
 import time
-import json
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Union
 import numpy as np
-import requests
 from config import Config
+from http_session import get_session, get_slots
+from review_cache import EmbeddingCache
 
 
-class EmbeddingClient:
-    """Embedding客户端 - 通过API调用embedding模型"""
+def _retry_backoff(max_retries: int = 3, retry_delay: float = 1.0, label: str = "Embedding API调用"):
+    """
+    重试装饰器：被装饰的函数抛出异常时按指数退避重试，重试耗尽后返回None
     
-    # 类级别变量，所有实例共享，用于控制Pydantic警告只显示一次
-    _pydantic_warning_shown = False
+    Args:
+        max_retries: 最大尝试次数
+        retry_delay: 首次重试延迟（秒），之后每次翻倍
+        label: 日志中的调用名称
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_retries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt < max_retries - 1:
+                        wait_time = retry_delay * (2 ** attempt)
+                        print(f"⚠️  {label}失败: {e}，{wait_time:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+                        time.sleep(wait_time)
+                    else:
+                        print(f"⚠️  {label}最终失败: {e}")
+            return None
+        return wrapper
+    return decorator
+
+
+class EmbeddingClient:
+    """Embedding客户端 - 直接以HTTP请求调用OpenAI兼容的 /embeddings 接口"""
     
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, base_url: Optional[str] = None):
         """
@@ -39,7 +66,7 @@ class EmbeddingClient:
         if not self.base_url:
             raise ValueError("API端点未找到，请设置 SCI_EMBEDDING_BASE_URL 环境变量")
         
-        # 确保base_url以/v1结尾（OpenAI客户端会自动添加/embeddings）
+        # 确保base_url以/v1结尾（请求时拼接/embeddings）
         if not self.base_url.endswith("/v1"):
             if self.base_url.endswith("/v1/embeddings"):
                 self.base_url = self.base_url.replace("/v1/embeddings", "/v1")
@@ -48,34 +75,24 @@ class EmbeddingClient:
             else:
                 self.base_url = self.base_url.rstrip("/") + "/v1"
         
-        # 创建OpenAI客户端
-        # 注意：如果遇到 Pydantic v2 兼容性问题，会自动切换到HTTP请求
-        self.use_http_only = False
+        # 向量维度，首次成功获取embedding后记录
+        self._dim: Optional[int] = None
         
-        try:
-            self.client = OpenAI(
-                base_url=self.base_url,
-                api_key=self.api_key,
-                max_retries=0  # 禁用自动重试，由我们自己控制重试逻辑
-            )
-        except Exception as e:
-            # 如果初始化失败，尝试使用默认配置
-            print(f"⚠️  OpenAI客户端初始化警告: {e}，尝试使用默认配置")
-            try:
-                self.client = OpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key
-                )
-            except Exception:
-                # 如果还是失败，使用HTTP请求
-                self.use_http_only = True
-                print(f"⚠️  OpenAI客户端初始化失败，将使用 HTTP 请求方式")
+        # 磁盘缓存（SCI_EMBEDDING_CACHE 开启时）：相同 (模型, 文本) 不再重复调用API
+        self._cache = (
+            EmbeddingCache(self.config.EMBEDDING_CACHE_DIR, self.model, self.config.EMBEDDING_CACHE_MAX_ENTRIES)
+            if self.config.EMBEDDING_CACHE else None
+        )
+        
+        # 复用同一端点的共享连接池（keep-alive），并发逐条请求时不再反复建立TCP/TLS连接
+        self._session = get_session(self.base_url, self.api_key)
         
         print(f"✅ Embedding客户端初始化成功:")
         print(f"  API端点: {self.base_url}")
         print(f"  模型: {self.model}")
     
-    def encode(self, texts: Union[List[str], str], show_progress_bar: bool = False, device: Optional[str] = None) -> np.ndarray:
+    def encode(self, texts: Union[List[str], str], show_progress_bar: bool = False, device: Optional[str] = None,
+               dtype: np.dtype = np.float32) -> np.ndarray:
         """
         获取文本的向量嵌入
         
@@ -83,190 +100,172 @@ class EmbeddingClient:
             texts: 输入文本（字符串或字符串列表）
             show_progress_bar: 是否显示进度条（API调用时忽略）
             device: 设备（API调用时忽略）
+            dtype: 返回数组的数据类型，默认float32；大规模检索可传 np.float16 减半内存，
+                   归一化后的余弦相似度与float32相差通常在1%以内
         
         Returns:
-            向量数组，单个文本返回1D数组，多个文本返回2D数组
+            向量数组，单个文本返回1D数组（空文本返回空数组），多个文本返回2D数组（空文本对应零向量）
         """
-        # 处理单个文本
+        # 处理单个文本：空文本返回空数组，调用方据此跳过后续计算
         if isinstance(texts, str):
+            if not texts.strip():
+                return np.zeros(0, dtype=dtype)
             texts = [texts]
             single_text = True
         else:
             single_text = False
         
-        # 过滤空文本
-        valid_texts = [text for text in texts if text and text.strip()]
-        if not valid_texts:
-            if single_text:
-                return np.array([])
-            else:
-                return np.array([[]] * len(texts))
-        
-        # 批量获取embedding
-        embeddings = []
-        for i, text in enumerate(texts):
-            if text and text.strip():
-                embedding = self._get_embedding(text)
-                if embedding is not None:
-                    embeddings.append(embedding)
-                else:
-                    embeddings.append([0.0] * 1024)
-            else:
-                embeddings.append([0.0] * 1024)
-        
-        # 转换为numpy数组
-        embeddings_array = np.array(embeddings)
+        # 批量获取embedding（每批只发起一次API请求，空文本或失败的条目为零向量，全部为空时不发起请求）
+        embeddings_array = self.embed_batch(texts)
+        if embeddings_array.dtype != dtype:
+            embeddings_array = embeddings_array.astype(dtype)
         
         # 如果是单个文本，返回1D数组
         if single_text:
-            return embeddings_array[0] if len(embeddings_array) > 0 else np.array([])
+            return embeddings_array[0]
         
         return embeddings_array
     
-    def _get_embedding(self, text: str, max_retries: int = 3, retry_delay: float = 1.0) -> Optional[List[float]]:
+    def embed_batch(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
         """
-        获取单个文本的向量嵌入
+        批量获取向量嵌入，每批文本只发起一次API请求
         
         Args:
-            text: 输入文本
-            max_retries: 最大重试次数
-            retry_delay: 重试延迟（秒），会指数增长
+            texts: 输入文本列表
+            batch_size: 单次请求的最大文本数（默认读取 EMBEDDING_BATCH_SIZE）
         
         Returns:
-            向量列表，失败时返回None
+            2D float32向量数组，行顺序与输入一致；空文本或失败的条目为零向量
         """
-        if not text or not text.strip():
-            return None
+        if not texts:
+            return np.zeros((0, self._dim or 1024), dtype=np.float32)
         
-        # 如果已检测到Pydantic兼容性问题，直接使用HTTP请求
-        if self.use_http_only:
-            return self._get_embedding_via_http(text, max_retries, retry_delay)
+        batch_size = batch_size or self.config.EMBEDDING_BATCH_SIZE
+        valid_indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
         
-        # 重试循环
-        for attempt in range(max_retries):
-            try:
-                # 调用embedding API
-                # 使用 try-except 捕获 Pydantic 相关错误
-                try:
-                    response = self.client.embeddings.create(
-                        model=self.model,
-                        input=text,
-                        encoding_format="float"
-                    )
-                except (ValueError, TypeError) as pydantic_error:
-                    # 捕获 Pydantic 验证错误（如字段名以下划线开头的问题）
-                    error_msg = str(pydantic_error)
-                    is_pydantic_error = (
-                        "leading underscores" in error_msg or 
-                        "pydantic" in error_msg.lower() or
-                        "Fields must not use names" in error_msg
-                    )
-                    if is_pydantic_error:
-                        # 如果是 Pydantic 兼容性问题，切换到HTTP请求
-                        self.use_http_only = True
-                        if not EmbeddingClient._pydantic_warning_shown:
-                            print(f"⚠️  检测到 Pydantic 兼容性问题，切换到 HTTP 请求方式（后续调用将静默使用HTTP）")
-                            EmbeddingClient._pydantic_warning_shown = True
-                        return self._get_embedding_via_http(text, max_retries - attempt, retry_delay)
-                    else:
-                        raise  # 重新抛出其他错误
-                
-                # 验证响应
-                if not hasattr(response, 'data') or not response.data:
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay * (2 ** attempt))
-                        continue
-                    return None
-                
-                # 获取embedding
-                embedding_obj = response.data[0]
-                if not hasattr(embedding_obj, 'embedding'):
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay * (2 ** attempt))
-                        continue
-                    return None
-                
-                embedding = embedding_obj.embedding
-                
-                # 验证embedding
-                if not embedding or not isinstance(embedding, list) or len(embedding) == 0:
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay * (2 ** attempt))
-                        continue
-                    return None
-                
-                return embedding
-                
-            except Exception as e:
-                error_msg = str(e)
-                # 检查是否是 Pydantic 相关错误（捕获所有异常类型）
-                is_pydantic_error = (
-                    "leading underscores" in error_msg or 
-                    "pydantic" in error_msg.lower() or
-                    "Fields must not use names" in error_msg
-                )
-                
-                if is_pydantic_error:
-                    # 检测到Pydantic兼容性问题，切换到HTTP请求
-                    self.use_http_only = True
-                    if not EmbeddingClient._pydantic_warning_shown:
-                        print(f"⚠️  检测到 Pydantic 兼容性问题，切换到 HTTP 请求方式（后续调用将静默使用HTTP）")
-                        EmbeddingClient._pydantic_warning_shown = True
-                    return self._get_embedding_via_http(text, max_retries - attempt, retry_delay)
-                
-                # 其他类型的错误，按原逻辑处理
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"⚠️  Embedding API调用失败: {e}，{wait_time:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
+        # 先查磁盘缓存，只为未命中的文本发起请求
+        if self._cache is not None:
+            missing = []
+            for i in valid_indices:
+                cached = self._cache.get(texts[i])
+                if cached is not None:
+                    embeddings[i] = cached
                 else:
-                    print(f"⚠️  Embedding API调用最终失败: {e}")
-                    return None
+                    missing.append(i)
+            valid_indices = missing
+        
+        for start in range(0, len(valid_indices), batch_size):
+            indices = valid_indices[start:start + batch_size]
+            batch = self._get_embeddings_batch([texts[i] for i in indices])
+            if batch is None:
+                # 批量请求失败时逐条回退；各请求相互独立且以网络等待为主，用线程池并发发起
+                batch = self._get_embeddings_concurrently([texts[i] for i in indices])
+            for i, embedding in zip(indices, batch):
+                embeddings[i] = embedding
+                if embedding and self._cache is not None:
+                    self._cache.put(texts[i], embedding)
         
-        return None
+        # 维度取自首个成功的结果并缓存，整批失败时沿用上次的维度，保证零向量与正常向量可对齐
+        dim = next((len(e) for e in embeddings if e is not None and len(e)), None)
+        if dim is not None:
+            self._dim = dim
+        dim = self._dim or 1024
+        result = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, embedding in enumerate(embeddings):
+            if embedding is not None and len(embedding) == dim:
+                result[i] = embedding
+        return result
+    
+    def _get_embeddings_concurrently(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """逐条请求多条文本的向量嵌入（并发执行），返回顺序与输入一致"""
+        workers = min(self.config.EMBEDDING_MAX_WORKERS, len(texts))
+        if workers <= 1:
+            return [self._get_embedding(text) for text in texts]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._get_embedding, texts))
     
-    def _get_embedding_via_http(self, text: str, max_retries: int = 3, retry_delay: float = 1.0) -> Optional[List[float]]:
+    @_retry_backoff(label="批量Embedding API调用")
+    def _get_embeddings_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
         """
-        使用原始 HTTP 请求获取 embedding（用于避免 Pydantic 兼容性问题）
+        单次请求获取多条文本的向量嵌入
+        
+        Returns:
+            与输入顺序一致的向量列表，重试后仍失败时返回None
         """
-        url = f"{self.base_url}/embeddings"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": self.model,
-            "input": text,
-            "encoding_format": "float"
-        }
+        data = self._post_embeddings(texts)
+        # 服务端返回的顺序不一定与输入一致，按index重排
+        data = sorted(data, key=lambda item: item.get("index", 0))
+        embeddings = [item.get("embedding") for item in data]
+        if len(embeddings) != len(texts) or not all(embeddings):
+            raise ValueError(f"响应中的embedding数量与输入不一致（{len(embeddings)}/{len(texts)}）")
+        return embeddings
+    
+    def _post_embeddings(self, texts: Union[List[str], str]) -> List[dict]:
+        """请求 embedding（单条或批量），返回响应中的 data 列表；并发请求数受 EMBEDDING_MAX_CONCURRENCY 限制"""
+        with get_slots("embedding", self.config.EMBEDDING_MAX_CONCURRENCY):
+            response = self._session.post(
+                f"{self.base_url}/embeddings",
+                data=orjson.dumps({
+                    "model": self.model,
+                    "input": texts,
+                    "encoding_format": "float"
+                }),
+                timeout=30
+            )
+        response.raise_for_status()
+        return orjson.loads(response.content).get('data') or []
+    
+    def _get_embedding(self, text: str) -> Optional[List[float]]:
+        """
+        获取单个文本的向量嵌入
         
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(url, headers=headers, json=payload, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                if 'data' in data and len(data['data']) > 0:
-                    embedding = data['data'][0].get('embedding')
-                    if embedding and isinstance(embedding, list) and len(embedding) > 0:
-                        return embedding
-                
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    time.sleep(wait_time)
-                    continue
-                return None
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"⚠️  HTTP Embedding API调用失败: {e}，{wait_time:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"⚠️  HTTP Embedding API调用最终失败: {e}")
-                    return None
+        Args:
+            text: 输入文本
         
-        return None
+        Returns:
+            向量列表，空文本或重试后仍失败时返回None
+        """
+        if not text or not text.strip():
+            return None
+        return self._request_embedding(text)
+    
+    @_retry_backoff(label="Embedding API调用")
+    def _request_embedding(self, text: str) -> List[float]:
+        """请求单个文本的向量嵌入，响应中没有有效向量时抛出异常触发重试"""
+        data = self._post_embeddings(text)
+        embedding = data[0].get('embedding') if data else None
+        if not embedding:
+            raise ValueError("响应中缺少embedding")
+        return embedding
+
+
+# 已创建的客户端实例，按解析后的 (api_key, model, base_url) 复用
+_INSTANCES = {}
+_INSTANCES_LOCK = threading.Lock()
 
+
+def get_embedding_client(api_key: Optional[str] = None, model: Optional[str] = None,
+                         base_url: Optional[str] = None) -> EmbeddingClient:
+    """
+    获取共享的Embedding客户端，相同配置只创建一次（线程安全）
+    
+    Args:
+        api_key: API密钥（默认读取配置）
+        model: 嵌入模型名称（默认读取配置）
+        base_url: API基础URL（默认读取配置）
+    """
+    key = (
+        api_key or Config.EMBEDDING_API_KEY,
+        model or Config.EMBEDDING_MODEL_NAME,
+        base_url or Config.EMBEDDING_API_ENDPOINT,
+    )
+    client = _INSTANCES.get(key)
+    if client is not None:
+        return client
+    with _INSTANCES_LOCK:
+        client = _INSTANCES.get(key)
+        if client is None:
+            client = EmbeddingClient(*key)
+            _INSTANCES[key] = client
+        return client
@@ -0,0 +1,204 @@
+"""
+HTTP会话模块 - 进程内共享的 requests.Session（连接池 + keep-alive）与出站请求并发名额
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# (端点, API密钥) -> 共享会话；同一服务的多个客户端实例复用同一个连接池
+_SESSIONS: Dict[Tuple[str, str], requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+# 服务名 -> 出站请求并发名额；同一服务的所有客户端、线程与异步调用共用
+_SLOTS: Dict[str, "ConcurrencySlots"] = {}
+_SLOTS_LOCK = threading.Lock()
+
+
+# 同步等待并发名额时调用 on_wait 回调的间隔（秒）
+_WAIT_CHECK_INTERVAL = 0.5
+
+
+class _Waiter:
+    """排队等待名额的调用方：线程等待 event，协程等待所在事件循环中的 future"""
+
+    __slots__ = ("event", "loop", "future")
+
+    def __init__(self, event: Optional[threading.Event] = None, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 future: Optional[asyncio.Future] = None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+
+
+def _resolve(future: asyncio.Future):
+    """在future所属事件循环中唤醒等待的协程（等待方已取消时忽略）"""
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencySlots:
+    """
+    出站请求并发名额，线程与协程共用同一份额度
+
+    等待者按先来后到排队，释放名额时直接交给队首：线程通过 threading.Event 唤醒，
+    协程通过所在事件循环的 future 唤醒，异步调用无需轮询也不会被阻塞等待的线程抢占。
+    """
+
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._free = self._limit
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None, on_wait: Optional[Callable[[], None]] = None) -> bool:
+        """
+        同步获取一个名额，在队列中阻塞等待
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+            on_wait: 等待期间定期调用的回调，抛出异常时放弃排队并向上抛出（用于响应请求取消）
+
+        Returns:
+            是否获取到名额（只有超时时返回False）
+        """
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return True
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                wait = _WAIT_CHECK_INTERVAL if on_wait is not None else None
+                if deadline is not None:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    wait = remaining if wait is None else min(wait, remaining)
+                if waiter.event.wait(wait):
+                    return True
+                if deadline is not None and time.monotonic() >= deadline:
+                    # 超时与交付名额同时发生时以实际结果为准
+                    return self._abandon(waiter)
+                if on_wait is not None:
+                    on_wait()
+        except BaseException:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    async def aacquire(self):
+        """异步获取一个名额，排队期间让出事件循环；所属任务被取消时不会遗留已获取的名额"""
+        with self._lock:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except BaseException:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        """归还一个名额：有等待者时直接交给队首，否则放回空闲额度"""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+            elif self._free >= self._limit:
+                raise ValueError("并发名额释放次数超过获取次数")
+            else:
+                self._free += 1
+                return
+
+        if waiter.event is not None:
+            waiter.event.set()
+            return
+        try:
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+        except RuntimeError:
+            # 等待方的事件循环已关闭，名额转交下一个等待者
+            self.release()
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """放弃排队；返回名额是否已经交给了该等待者（此时由调用方负责使用或归还）"""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+                return False
+            except ValueError:
+                return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+def get_session(base_url: str, api_key: str) -> requests.Session:
+    """
+    获取指定端点与密钥对应的共享会话，不存在时创建（线程安全）
+
+    会话已挂载连接池并设置好认证与Content-Type请求头；不启用urllib3的自动重试，
+    重试由各客户端自行控制。
+
+    Args:
+        base_url: API端点
+        api_key: API密钥
+    """
+    key = (base_url, api_key)
+    session = _SESSIONS.get(key)
+    if session is not None:
+        return session
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            })
+            _SESSIONS[key] = session
+        return session
+
+
+def get_slots(name: str, limit: int) -> ConcurrencySlots:
+    """
+    获取指定服务的出站请求并发名额（首次调用时按 limit 创建，线程安全）
+
+    名额在请求期间持有、重试等待期间释放，并发超过服务商限制时在本地排队，避免触发限流后集中重试。
+
+    Args:
+        name: 服务名（如 "llm"、"embedding"）
+        limit: 并发上限
+    """
+    slots = _SLOTS.get(name)
+    if slots is not None:
+        return slots
+    with _SLOTS_LOCK:
+        slots = _SLOTS.get(name)
+        if slots is None:
+            slots = ConcurrencySlots(limit)
+            _SLOTS[name] = slots
+        return slots
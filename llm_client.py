@@ -1,7 +1,81 @@
+import asyncio
+import httpx
+import orjson
 import requests
+import threading
 import time
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from urllib.parse import urlparse
 from config import Config
+from http_session import get_session, get_slots
+
+
+# 当前请求的取消标志：服务层在请求开始时设置，asyncio.to_thread 会把上下文复制到工作线程；
+# 客户端断开后置位，正在重试或流式读取的LLM调用据此尽快中止
+llm_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("llm_cancel_event", default=None)
+
+
+# 异步请求的建立连接超时（秒）；读取超时沿用请求超时，上游超时以 httpx.TimeoutException 直接暴露
+_CONNECT_TIMEOUT = 10.0
+
+
+def _check_cancelled():
+    """所属请求已取消时抛出异常，中止后续的LLM调用"""
+    event = llm_cancel_event.get()
+    if event is not None and event.is_set():
+        raise Exception("LLM调用已取消：客户端已断开连接")
+
+
+@contextmanager
+def _llm_slot():
+    """占用一个LLM并发名额（同步调用，排队等待期间响应取消）"""
+    slots = get_slots("llm", Config.LLM_MAX_CONCURRENCY)
+    slots.acquire(on_wait=_check_cancelled)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def _allm_slot():
+    """占用一个LLM并发名额（异步调用）：与同步调用共用同一份额度并按先来后到排队，等待期间不阻塞事件循环"""
+    return get_slots("llm", Config.LLM_MAX_CONCURRENCY)
+
+
+def _retry_wait(error: Exception, attempt: int, max_retries: int, timed_out: bool = False,
+                label: str = "API调用") -> int:
+    """
+    重试策略（同步、异步与流式调用共用）：返回下次重试前的等待秒数（指数退避），重试次数用尽时抛出最终异常
+
+    Args:
+        error: 本次尝试的异常
+        attempt: 本次尝试的序号（从0开始）
+        max_retries: 最大尝试次数
+        timed_out: 本次尝试是否为请求超时
+        label: 日志与异常信息中的调用名称
+    """
+    if attempt >= max_retries - 1:
+        if timed_out:
+            raise Exception(f"{label}超时，已重试{max_retries}次")
+        raise Exception(f"{label}失败: {error}")
+    wait_time = 2 ** attempt
+    if timed_out:
+        print(f"API超时，{wait_time}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+    else:
+        print(f"{label}失败: {error}，{wait_time}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+    return wait_time
+
+
+def _retry_sleep(seconds: float):
+    """重试等待，所属请求被取消时提前唤醒并中止"""
+    event = llm_cancel_event.get()
+    if event is None:
+        time.sleep(seconds)
+        return
+    event.wait(seconds)
+    _check_cancelled()
 
 
 class LLMClient:
@@ -31,62 +105,59 @@ class LLMClient:
         self.max_retries = kwargs.get('max_retries', self.config.MAX_RETRIES)
         self.timeout = kwargs.get('timeout', self.config.LLM_REQUEST_TIMEOUT)
 
-    def _make_api_call(self, prompt: str) -> str:
-        """使用自定义API端点调用"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # 复用同一端点的共享连接池（keep-alive），避免每次调用都重新建立TCP/TLS连接；重试由本类自行控制
+        self._session = get_session(self.endpoint, self.api_key)
+        # 异步调用使用的httpx客户端，首次在事件循环中调用时创建
+        self._async_client: Optional[httpx.AsyncClient] = None
 
-        data = {
-            "model": self.llm,
+    def _make_api_call(self, prompt: str, *, llm: Optional[str] = None, temperature: Optional[float] = None,
+                       max_retries: Optional[int] = None, timeout: Optional[float] = None) -> str:
+        """使用自定义API端点调用（参数显式传入，不修改实例状态，可在多线程间共享）"""
+        llm = llm or self.llm
+        temperature = self.temperature if temperature is None else temperature
+        max_retries = max_retries or self.max_retries
+        timeout = timeout or self.timeout
+
+        # 请求体只序列化一次（orjson），重试时直接复用
+        data = orjson.dumps({
+            "model": llm,
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": self.temperature,
+            "temperature": temperature,
             "stream": False
-        }
+        })
 
-        for attempt in range(self.max_retries):
+        for attempt in range(max_retries):
+            _check_cancelled()
             try:
-                response = requests.post(
-                    f"{self.endpoint}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=self.timeout
-                )
+                with _llm_slot():
+                    response = self._session.post(
+                        f"{self.endpoint}/chat/completions",
+                        data=data,
+                        timeout=timeout
+                    )
                 response.raise_for_status()
 
-                result = response.json()
-                
-                # 检查响应格式
-                if "choices" not in result or not result["choices"]:
-                    raise Exception(f"API响应格式错误: 缺少choices字段或choices为空。响应: {result}")
-                
-                if "message" not in result["choices"][0] or "content" not in result["choices"][0]["message"]:
-                    raise Exception(f"API响应格式错误: 缺少message或content字段。响应: {result}")
-                
-                content = result["choices"][0]["message"]["content"]
-                if content is None:
-                    raise Exception("API返回的content为None")
-                
-                return content
-
-            except requests.exceptions.Timeout:
-                if attempt < self.max_retries - 1:
-                    wait_time = 2 ** attempt
-                    print(f"API超时，{wait_time}秒后重试... (尝试 {attempt + 1}/{self.max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    raise Exception(f"API调用超时，已重试{self.max_retries}次")
+                return self._extract_content(orjson.loads(response.content))
 
-            except requests.exceptions.RequestException as e:
-                if attempt < self.max_retries - 1:
-                    wait_time = 2 ** attempt
-                    print(f"API调用失败: {e}，{wait_time}秒后重试... (尝试 {attempt + 1}/{self.max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    raise Exception(f"API调用失败: {e}")
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+                timed_out = isinstance(e, requests.exceptions.Timeout)
+                _retry_sleep(_retry_wait(e, attempt, max_retries, timed_out))
+
+    @staticmethod
+    def _extract_content(result: dict) -> str:
+        """从chat completions响应中取出content，格式不符时抛出异常"""
+        # 检查响应格式
+        if "choices" not in result or not result["choices"]:
+            raise Exception(f"API响应格式错误: 缺少choices字段或choices为空。响应: {result}")
+        
+        if "message" not in result["choices"][0] or "content" not in result["choices"][0]["message"]:
+            raise Exception(f"API响应格式错误: 缺少message或content字段。响应: {result}")
+        
+        content = result["choices"][0]["message"]["content"]
+        if content is None:
+            raise Exception("API返回的content为None")
+        
+        return content
 
     def get_response(self, prompt: str, use_reasoning_model: bool = False, **kwargs) -> str:
         """获取LLM响应
@@ -94,38 +165,147 @@ class LLMClient:
         Args:
             prompt: 提示词
             use_reasoning_model: 是否使用推理模型，如果为True则使用Config.LLM_REASONING_MODEL
-            **kwargs: 其他参数（temperature, max_retries等）
+            **kwargs: 其他参数（temperature, max_retries, timeout等）
         """
         temperature = kwargs.get('temperature', self.temperature)
         max_retries = kwargs.get('max_retries', self.max_retries)
+        timeout = kwargs.get('timeout')
 
-        # 临时更新参数
-        original_temp = self.temperature
-        original_retries = self.max_retries
-        original_llm = self.llm
-        self.temperature = temperature
-        self.max_retries = max_retries
-        
-        # 如果使用推理模型，临时替换模型名称
-        if use_reasoning_model:
-            self.llm = self.config.LLM_REASONING_MODEL
+        # 如果使用推理模型，替换本次调用的模型名称
+        # 参数只作用于本次调用，不修改实例属性，客户端可被多个请求并发复用
+        llm = self.config.LLM_REASONING_MODEL if use_reasoning_model else self.llm
 
-        try:
-            return self._make_api_call(prompt)
-        finally:
-            # 恢复原始参数
-            self.temperature = original_temp
-            self.max_retries = original_retries
-            self.llm = original_llm
+        return self._make_api_call(prompt, llm=llm, temperature=temperature, max_retries=max_retries, timeout=timeout)
+
+    async def aget_response(self, prompt: str, use_reasoning_model: bool = False, **kwargs) -> str:
+        """异步获取LLM响应（httpx），等待期间不占用线程池
+
+        参数与 get_response 相同；所属任务被取消时请求随之中止，无需检查取消标志。
+        """
+        temperature = kwargs.get('temperature', self.temperature)
+        max_retries = kwargs.get('max_retries', self.max_retries)
+        timeout = kwargs.get('timeout') or self.timeout
+        llm = self.config.LLM_REASONING_MODEL if use_reasoning_model else self.llm
+
+        data = orjson.dumps({
+            "model": llm,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "stream": False
+        })
+        client = self._get_async_client()
+
+        for attempt in range(max_retries):
+            try:
+                async with _allm_slot():
+                    response = await client.post(
+                        f"{self.endpoint}/chat/completions",
+                        content=data,
+                        timeout=httpx.Timeout(timeout, connect=_CONNECT_TIMEOUT)
+                    )
+                response.raise_for_status()
+                return self._extract_content(orjson.loads(response.content))
+
+            except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+                timed_out = isinstance(e, httpx.TimeoutException)
+                await asyncio.sleep(_retry_wait(e, attempt, max_retries, timed_out))
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取异步httpx客户端（连接池在同一事件循环内的所有请求间共享）"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                timeout=httpx.Timeout(self.timeout, connect=_CONNECT_TIMEOUT)
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """关闭异步httpx客户端（应用退出时调用）"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def stream_response(self, prompt: str, use_reasoning_model: bool = False, **kwargs) -> Iterator[str]:
+        """流式获取LLM响应，按到达顺序逐段返回content增量
+
+        只在收到第一段内容之前重试；一旦开始输出，后续错误直接抛出，
+        避免重复输出已发送给客户端的内容。
+
+        Args:
+            prompt: 提示词
+            use_reasoning_model: 是否使用推理模型
+            **kwargs: 其他参数（temperature, max_retries, timeout等）
+        """
+        temperature = kwargs.get('temperature', self.temperature)
+        max_retries = kwargs.get('max_retries', self.max_retries)
+        timeout = kwargs.get('timeout') or self.timeout
+        llm = self.config.LLM_REASONING_MODEL if use_reasoning_model else self.llm
+
+        data = orjson.dumps({
+            "model": llm,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "stream": True
+        })
+
+        for attempt in range(max_retries):
+            _check_cancelled()
+            started = False
+            try:
+                # 流式读取期间一直占用并发名额，生成器关闭（含客户端断开）时释放
+                with _llm_slot(), self._session.post(
+                    f"{self.endpoint}/chat/completions",
+                    data=data,
+                    timeout=timeout,
+                    stream=True
+                ) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines(decode_unicode=True):
+                        # 客户端已断开时退出with块，关闭上游连接
+                        _check_cancelled()
+                        if not line or not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == "[DONE]":
+                            break
+                        chunk = orjson.loads(payload)
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        # 推理模型的思考过程（reasoning_content）不输出，只转发正文
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            started = True
+                            yield content
+                return
+
+            except requests.exceptions.RequestException as e:
+                if started:
+                    raise Exception(f"API流式调用失败: {e}")
+                _retry_sleep(_retry_wait(e, attempt, max_retries, label="API流式调用"))
 
     def validate_config(self) -> bool:
-        """验证配置是否正确"""
+        """验证配置是否正确（只做本地检查，不发起网络请求）"""
+        parsed = urlparse(self.endpoint or "")
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            print(f"配置验证失败: LLM端点不是有效的URL: {self.endpoint}")
+            return False
+        if not self.api_key or not self.llm:
+            print("配置验证失败: API密钥或模型名称为空")
+            return False
+        return True
+
+    def ping(self) -> bool:
+        """发送一次真实请求检查LLM服务是否可用（会消耗token，仅在需要在线检查时调用）"""
         try:
-            # 尝试一个简单的请求来验证配置
-            test_response = self.get_response("Hello", max_retries=1)
+            self.get_response("Hello", max_retries=1)
             return True
         except Exception as e:
-            print(f"配置验证失败: {e}")
+            print(f"LLM服务检查失败: {e}")
             return False
 
     def get_config_info(self) -> dict:
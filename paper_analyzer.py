@@ -1,6 +1,12 @@
 """
 论文分析模块 - 关键信息提取、查询构建、语义相似度分析、创新点识别
 """
+import hashlib
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any
 import numpy as np
 from llm_client import LLMClient
@@ -10,6 +16,31 @@ from prompt_template import get_keyword_extraction_prompt, get_innovation_analys
 from config import Config
 
 
+# 关键词解析与备用提取用到的正则，模块加载时编译一次
+_KEYWORD_PREFIX_RE = re.compile(r'^(关键词|keywords|keyword)[:：]?\s*', re.IGNORECASE)
+_HAS_LATIN_RE = re.compile(r'[a-zA-Z]')
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7F]+')
+_EDGE_PUNCT_RE = re.compile(r'^[^\w]+|[^\w]+$')
+_KEYWORD_SPLIT_RE = re.compile(r'[,;，；\s]+')
+_WORD4_RE = re.compile(r'\b[a-zA-Z]{4,}\b')
+_WORD3_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# 明显与任务本身相关的通用词：LLM只提取出这些词时，可能是误解了任务
+_TASK_GENERIC_WORDS = frozenset({
+    'keyword extraction', 'keyword', 'keywords', 'extraction',
+    'natural language processing', 'nlp', 'text mining', 'text analysis',
+    'information retrieval', 'information extraction', 'data mining'
+})
+
+# 备用关键词提取的停用词（模块级常量，避免每次调用重新构建集合）
+# 从Abstract提取4字符以上的词时使用
+_ABSTRACT_STOP_WORDS = frozenset({'this', 'that', 'these', 'those', 'with', 'from', 'have', 'been', 'will', 'would', 'could', 'should', 'might', 'must', 'paper', 'study', 'research', 'method', 'approach', 'propose', 'present', 'show', 'demonstrate', 'result', 'experiment', 'evaluation', 'performance', 'improve', 'better', 'compared', 'previous', 'existing', 'novel', 'new', 'using', 'based', 'through', 'which', 'where', 'while', 'when', 'their', 'there', 'these', 'those'})
+# 从Title提取时使用
+_TITLE_STOP_WORDS = frozenset({'this', 'that', 'with', 'from', 'paper', 'study', 'research', 'method', 'approach', 'novel', 'new', 'using', 'based'})
+# 从Abstract补充提取3字符以上的词时使用
+_EXTENDED_STOP_WORDS = frozenset({'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use', 'this', 'that', 'with', 'from', 'have', 'been', 'will', 'would', 'could', 'should', 'might', 'must', 'paper', 'study', 'research', 'method', 'approach', 'propose', 'present', 'show', 'demonstrate', 'result', 'experiment', 'evaluation', 'performance', 'improve', 'better', 'compared', 'previous', 'existing', 'novel', 'new', 'using', 'based', 'through', 'which', 'where', 'while', 'when', 'their', 'there', 'these', 'those'})
+
+
 class PaperAnalyzer:
     """论文分析器"""
     
@@ -24,6 +55,12 @@ class PaperAnalyzer:
         "Technical Approach"
     ]
     FALLBACK_SNIPPET_LENGTH = 1800
+    # 标题+摘要短于该长度的相关论文不请求embedding，相似度直接记为0
+    MIN_SIMILARITY_TEXT_CHARS = 20
+    # 相关论文量化向量的最大缓存条数
+    PAPER_VECTOR_CACHE_SIZE = 4096
+    # LLM响应（关键词提取、创新点分析）的最大缓存条数
+    LLM_RESPONSE_CACHE_SIZE = 1024
 
     def __init__(self, llm_client: LLMClient, embedding_client: EmbeddingClient, retriever: PaperRetriever):
         """
@@ -38,8 +75,15 @@ class PaperAnalyzer:
         self.embedding_client = embedding_client
         self.retriever = retriever
         self.config = Config
+        # 论文ID -> (int8量化的归一化embedding, 缩放系数)（LRU），分析器在请求间共享，读写需加锁
+        self._paper_vectors = OrderedDict()
+        self._vector_lock = threading.Lock()
+        # 提示词哈希 -> LLM响应（LRU），同一论文重复评阅时跳过关键词提取与创新点分析的LLM调用
+        self._llm_responses = OrderedDict()
+        self._response_lock = threading.Lock()
 
-    def extract_keywords(self, structured_info: Dict[str, str], timeout: Optional[int] = None, language: str = 'en') -> List[str]:
+    def extract_keywords(self, structured_info: Dict[str, str], timeout: Optional[int] = None, language: str = 'en',
+                         info_text: Optional[str] = None) -> List[str]:
         """
         提取论文关键词
         
@@ -47,6 +91,7 @@ class PaperAnalyzer:
             structured_info: 结构化的论文信息
             timeout: 超时时间（秒）
             language: 语言，'zh'表示中文，'en'表示英文
+            info_text: 已格式化的结构化信息（调用方只格式化一次时传入，默认现场格式化）
         
         Returns:
             关键词列表
@@ -54,119 +99,124 @@ class PaperAnalyzer:
         timeout = timeout or self.config.KEY_EXTRACTION_TIMEOUT
         
         try:
-            # 构建结构化信息文本
-            info_text = self._format_structured_info(structured_info)
-            
-            prompt = get_keyword_extraction_prompt(info_text, language=language)
-            
             # 使用推理模型进行深度理解，提升关键词提取的准确性
-            response = self.llm_client.get_response(
-                prompt,
-                use_reasoning_model=True,
-                temperature=0.3,
-                timeout=timeout
-            )
-            
-            # 解析关键词
-            import re
-            # 移除可能的前缀提示文本（如"现在请提取关键词："等）
-            response_clean = response.strip()
-            # 查找最后一个冒号或换行符后的内容（通常是实际的关键词列表）
-            if ':' in response_clean:
-                # 尝试找到最后一个冒号后的内容
-                parts = response_clean.split(':')
-                if len(parts) > 1:
-                    response_clean = parts[-1].strip()
-            # 移除可能的前缀文本（如"关键词："、"Keywords:"等）
-            response_clean = re.sub(r'^(关键词|keywords|keyword)[:：]?\s*', '', response_clean, flags=re.IGNORECASE)
-            
-            # 按逗号分割
-            raw_keywords = [kw.strip() for kw in response_clean.split(',')]
-            # 只保留包含英文字母的关键词（过滤掉纯中文或其他非英文内容）
-            keywords = []
-            # 定义一些明显与任务相关的通用词，如果提取到这些词，可能是LLM误解了任务
-            task_related_generic_words = {
-                'keyword extraction', 'keyword', 'keywords', 'extraction',
-                'natural language processing', 'nlp', 'text mining', 'text analysis',
-                'information retrieval', 'information extraction', 'data mining'
-            }
-            
-            for kw in raw_keywords:
-                kw_lower = kw.lower().strip()
-                # 只保留包含至少一个英文字母的关键词
-                if kw_lower and re.search(r'[a-zA-Z]', kw_lower):
-                    # 提取英文部分（去除可能的中文说明）
-                    english_part = re.sub(r'[^\x00-\x7F]+', '', kw_lower).strip()
-                    # 移除可能的标点符号
-                    english_part = re.sub(r'^[^\w]+|[^\w]+$', '', english_part)
-                    if english_part:
-                        # 检查是否是任务相关的通用词（如果只有这些词，可能是误解了任务）
-                        # 但如果关键词列表中有其他具体词，保留这些词作为备选
-                        keywords.append(english_part)
-            
-            # 限制关键词数量
-            keywords = keywords[:4]
-            
-            # 如果提取到的关键词都是任务相关的通用词，说明LLM可能误解了任务，使用备用方法
-            if keywords and all(kw in task_related_generic_words for kw in keywords):
-                print(f"⚠️  检测到可能提取了任务相关的通用词: {keywords}，使用备用方法重新提取")
-                # 使用备用方法从论文内容中提取关键词
-                fallback_keywords = self._extract_fallback_keywords(structured_info)
-                if fallback_keywords:
-                    return fallback_keywords
-                # 如果备用方法也失败，返回原始关键词（总比没有好）
-            
-            return keywords if keywords else []
+            prompt = self._keyword_prompt(structured_info, language, info_text)
+            response = self._get_response_cached(prompt, temperature=0.3, timeout=timeout)
+            return self._parse_keywords(response, structured_info)
+        except Exception as e:
+            return self._keywords_on_failure(e, structured_info)
+
+    async def aextract_keywords(self, structured_info: Dict[str, str], timeout: Optional[int] = None, language: str = 'en',
+                                info_text: Optional[str] = None) -> List[str]:
+        """提取论文关键词（异步版本，LLM调用不占用线程池），参数与返回值同 extract_keywords"""
+        timeout = timeout or self.config.KEY_EXTRACTION_TIMEOUT
+        
+        try:
+            prompt = self._keyword_prompt(structured_info, language, info_text)
+            response = await self._aget_response_cached(prompt, temperature=0.3, timeout=timeout)
+            return self._parse_keywords(response, structured_info)
         except Exception as e:
-            print(f"⚠️  关键词提取失败: {e}")
-            # 从结构化信息中提取备用关键词
-            return self._extract_fallback_keywords(structured_info)
+            return self._keywords_on_failure(e, structured_info)
+
+    def _keyword_prompt(self, structured_info: Dict[str, str], language: str, info_text: Optional[str]) -> str:
+        """构建关键词提取提示词（同步与异步版本共用）"""
+        return get_keyword_extraction_prompt(info_text or self._format_structured_info(structured_info), language=language)
+
+    def _keywords_on_failure(self, error: Exception, structured_info: Dict[str, str]) -> List[str]:
+        """关键词提取失败时记录日志，并从结构化信息中提取备用关键词"""
+        print(f"⚠️  关键词提取失败: {error}")
+        return self._extract_fallback_keywords(structured_info)
+
+    def _parse_keywords(self, response: str, structured_info: Dict[str, str]) -> List[str]:
+        """从LLM响应中解析关键词，结果只包含任务通用词时改用备用方法"""
+        # 移除可能的前缀提示文本（如"现在请提取关键词："等）
+        response_clean = response.strip()
+        # 查找最后一个冒号或换行符后的内容（通常是实际的关键词列表）
+        if ':' in response_clean:
+            # 尝试找到最后一个冒号后的内容
+            parts = response_clean.split(':')
+            if len(parts) > 1:
+                response_clean = parts[-1].strip()
+        # 移除可能的前缀文本（如"关键词："、"Keywords:"等）
+        response_clean = _KEYWORD_PREFIX_RE.sub('', response_clean)
+        
+        # 按逗号分割
+        raw_keywords = response_clean.split(',')
+        # 只保留包含英文字母的关键词（过滤掉纯中文或其他非英文内容），最多4个
+        keywords = []
+        for kw in raw_keywords:
+            # 已凑够4个关键词，冗长响应的剩余部分不再逐项处理
+            if len(keywords) >= 4:
+                break
+            kw_lower = kw.lower().strip()
+            # 只保留包含至少一个英文字母的关键词
+            if kw_lower and _HAS_LATIN_RE.search(kw_lower):
+                # 提取英文部分（去除可能的中文说明）
+                english_part = _NON_ASCII_RE.sub('', kw_lower).strip()
+                # 移除可能的标点符号
+                english_part = _EDGE_PUNCT_RE.sub('', english_part)
+                if english_part:
+                    # 检查是否是任务相关的通用词（如果只有这些词，可能是误解了任务）
+                    # 但如果关键词列表中有其他具体词，保留这些词作为备选
+                    keywords.append(english_part)
+        
+        # 如果提取到的关键词都是任务相关的通用词，说明LLM可能误解了任务，使用备用方法
+        if keywords and all(kw in _TASK_GENERIC_WORDS for kw in keywords):
+            print(f"⚠️  检测到可能提取了任务相关的通用词: {keywords}，使用备用方法重新提取")
+            # 使用备用方法从论文内容中提取关键词
+            fallback_keywords = self._extract_fallback_keywords(structured_info)
+            if fallback_keywords:
+                return fallback_keywords
+            # 如果备用方法也失败，返回原始关键词（总比没有好）
+        
+        return keywords if keywords else []
 
     def _extract_fallback_keywords(self, structured_info: Dict[str, str]) -> List[str]:
         """备用关键词提取方法 - 只提取英文关键词（用于论文检索）"""
-        import re
-        keywords = []
-        
+        keywords: List[str] = []
+        seen = set()
+        # 各来源取出的候选词总数（含重复），决定是否继续从后续来源补充
+        collected = 0
+
+        def add(candidates: List[str]):
+            """按顺序追加候选词，边加边去重；凑够4个关键词后不再追加"""
+            nonlocal collected
+            collected += len(candidates)
+            for word in candidates:
+                if len(keywords) >= 4:
+                    return
+                if word not in seen:
+                    seen.add(word)
+                    keywords.append(word)
+
         # 从Keywords字段提取（优先）
         if "Keywords" in structured_info:
             kw_text = structured_info["Keywords"]
             # 支持中英文关键词，按逗号、分号或空格分隔
-            kw_list = re.split(r'[,;，；\s]+', kw_text)
+            kw_list = _KEYWORD_SPLIT_RE.split(kw_text)
             # 只保留英文关键词（包含至少一个英文字母）
-            english_kws = [kw.strip().lower() for kw in kw_list if kw.strip() and re.search(r'[a-zA-Z]', kw.strip())]
-            keywords.extend(english_kws[:3])
-        
+            english_kws = [kw.strip().lower() for kw in kw_list if kw.strip() and _HAS_LATIN_RE.search(kw.strip())]
+            add(english_kws[:3])
+
+        # Abstract只分词一次（至少3个字符的英文单词），下面两处提取共用
+        abstract_words = _WORD3_RE.findall(structured_info["Abstract"].lower()) if "Abstract" in structured_info else []
+
         # 从Abstract提取英文关键词（优先于Title，因为Abstract通常包含更多技术术语）
-        if "Abstract" in structured_info:
-            abstract = structured_info["Abstract"]
-            # 提取英文单词（至少4个字符，排除停用词）
-            words = re.findall(r'\b[a-zA-Z]{4,}\b', abstract.lower())
-            stop_words = {'this', 'that', 'these', 'those', 'with', 'from', 'have', 'been', 'will', 'would', 'could', 'should', 'might', 'must', 'paper', 'study', 'research', 'method', 'approach', 'propose', 'present', 'show', 'demonstrate', 'result', 'experiment', 'evaluation', 'performance', 'improve', 'better', 'compared', 'previous', 'existing', 'novel', 'new', 'using', 'based', 'through', 'which', 'where', 'while', 'when', 'their', 'there', 'these', 'those'}
-            words = [w for w in words if w not in stop_words]
-            # 优先选择较长的词（通常是技术术语）
-            words = sorted(words, key=len, reverse=True)
-            keywords.extend(words[:3])
-        
+        if abstract_words:
+            # 至少4个字符、排除停用词，优先选择较长的词（通常是技术术语）
+            words = [w for w in abstract_words if len(w) >= 4 and w not in _ABSTRACT_STOP_WORDS]
+            add(heapq.nlargest(3, words, key=len))
+
         # 从Title提取（如果关键词还不够）
-        if len(keywords) < 2 and "Title" in structured_info:
-            title = structured_info["Title"]
+        if collected < 2 and "Title" in structured_info:
             # 只提取英文单词
-            words = re.findall(r'\b[a-zA-Z]{4,}\b', title.lower())
-            stop_words = {'this', 'that', 'with', 'from', 'paper', 'study', 'research', 'method', 'approach', 'novel', 'new', 'using', 'based'}
-            words = [w for w in words if w not in stop_words]
-            keywords.extend(words[:2])
-        
-        # 如果还是没有足够的关键词，尝试从Abstract提取更多
-        if len(keywords) < 2 and "Abstract" in structured_info:
-            abstract = structured_info["Abstract"]
-            # 提取所有英文单词（至少3个字符）
-            words = re.findall(r'\b[a-zA-Z]{3,}\b', abstract.lower())
-            stop_words = {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use', 'this', 'that', 'with', 'from', 'have', 'been', 'will', 'would', 'could', 'should', 'might', 'must', 'paper', 'study', 'research', 'method', 'approach', 'propose', 'present', 'show', 'demonstrate', 'result', 'experiment', 'evaluation', 'performance', 'improve', 'better', 'compared', 'previous', 'existing', 'novel', 'new', 'using', 'based', 'through', 'which', 'where', 'while', 'when', 'their', 'there', 'these', 'those'}
-            words = [w for w in words if w not in stop_words]
-            keywords.extend(words[:2])
-        
-        # 去重并限制数量（最多4个）
-        keywords = list(dict.fromkeys(keywords))[:4]  # 使用dict.fromkeys保持顺序并去重
+            words = _WORD4_RE.findall(structured_info["Title"].lower())
+            add([w for w in words if w not in _TITLE_STOP_WORDS][:2])
+
+        # 如果还是没有足够的关键词，尝试从Abstract提取更多（至少3个字符）
+        if collected < 2 and abstract_words:
+            add([w for w in abstract_words if w not in _EXTENDED_STOP_WORDS][:2])
+
         return keywords
 
     def build_query(self, keywords: List[str], structured_info: Dict[str, str]) -> str:
@@ -202,25 +252,31 @@ class PaperAnalyzer:
             timeout: 超时时间（秒）
         
         Returns:
-            相关论文列表
+            相关论文列表，每篇论文的 title/abstract 保证为字符串（缺失时为空串）
         """
         timeout = timeout or self.config.RETRIEVAL_TIMEOUT
         
         try:
             # 使用混合检索策略
-            papers = self.retriever.hybrid_retrieve(query, keywords)
-            return papers[:10]  # 最多返回10篇
+            papers = self.retriever.hybrid_retrieve(query, keywords)[:10]  # 最多返回10篇
+            # 在检索边界统一补齐缺省值，后续各阶段直接读取字段，无需反复 get(...) or ''
+            for paper in papers:
+                paper['title'] = paper.get('title') or ''
+                paper['abstract'] = paper.get('abstract') or ''
+            return papers
         except Exception as e:
             print(f"⚠️  论文检索失败: {e}")
             return []
 
-    def calculate_semantic_similarity(self, paper_text: str, related_papers: List[Dict]) -> List[Tuple[Dict, float]]:
+    def calculate_semantic_similarity(self, paper_text: str, related_papers: List[Dict],
+                                      paper_embedding: Optional[np.ndarray] = None) -> List[Tuple[Dict, float]]:
         """
         计算语义相似度
         
         Args:
             paper_text: 待评论文本
-            related_papers: 相关论文列表
+            related_papers: 相关论文列表（retrieve_related_papers 的结果，title/abstract 已补齐）
+            paper_embedding: 预先计算好的待评论文embedding（可与检索并行获取），提供时只请求相关论文的embedding
         
         Returns:
             (论文, 相似度) 元组列表
@@ -229,46 +285,87 @@ class PaperAnalyzer:
             return []
         
         try:
-            # 计算待评论文的embedding
-            paper_embedding = self.embedding_client.encode(paper_text, show_progress_bar=False)
-            
-            if paper_embedding is None or len(paper_embedding) == 0:
-                return [(paper, 0.0) for paper in related_papers]
-            
-            # 计算相关论文的embedding
-            related_texts = []
-            for paper in related_papers:
-                title = paper.get('title', '') or ''
-                abstract = paper.get('abstract', '') or ''
-                text = f"{title} {abstract}".strip()
-                related_texts.append(text if text else " ")
+            related_texts = [
+                f"{paper['title']} {paper['abstract']}".strip()
+                for paper in related_papers
+            ]
             
-            related_embeddings = self.embedding_client.encode(related_texts, show_progress_bar=False)
+            # 相关论文的归一化向量按论文ID缓存，检索结果重复出现时不再请求embedding、也不再重复计算范数
+            cache_keys = [paper.get('paperId') or paper['title'] or None for paper in related_papers]
+            with self._vector_lock:
+                vectors = []
+                for key in cache_keys:
+                    vector = self._paper_vectors.get(key) if key else None
+                    if vector is not None:
+                        self._paper_vectors.move_to_end(key)
+                    vectors.append(vector)
+            # 过短的文本（缺少标题与摘要的条目）不值得请求embedding，保持None即得分为0
+            missing = [i for i, vector in enumerate(vectors)
+                       if vector is None and len(related_texts[i]) >= self.MIN_SIMILARITY_TEXT_CHARS]
             
-            if related_embeddings is None or len(related_embeddings) == 0:
+            # 未缓存的相关论文（以及未预先提供时的待评论文）批量获取embedding，只发起一次API请求
+            need_paper = paper_embedding is None or np.size(paper_embedding) == 0
+            texts = ([paper_text] if need_paper else []) + [related_texts[i] for i in missing]
+            fetched = self.embedding_client.embed_batch(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+            if fetched is None or fetched.ndim != 2 or len(fetched) != len(texts):
                 return [(paper, 0.0) for paper in related_papers]
+            if need_paper:
+                paper_embedding, fetched = fetched[0], fetched[1:]
             
-            # 确保是2D数组
-            if related_embeddings.ndim == 1:
-                related_embeddings = related_embeddings.reshape(1, -1)
+            query_vec = self._normalize(paper_embedding)
+            if query_vec is None:
+                return [(paper, 0.0) for paper in related_papers]
             
-            # 计算相似度
-            similarities = []
-            for i, related_emb in enumerate(related_embeddings):
-                similarity = np.dot(paper_embedding, related_emb) / (
-                    np.linalg.norm(paper_embedding) * np.linalg.norm(related_emb) + 1e-8
-                )
-                similarities.append((related_papers[i], float(similarity)))
+            with self._vector_lock:
+                for i, embedding in zip(missing, fetched):
+                    vectors[i] = self._quantize(self._normalize(embedding))
+                    if vectors[i] is not None and cache_keys[i]:
+                        self._paper_vectors[cache_keys[i]] = vectors[i]
+                        self._paper_vectors.move_to_end(cache_keys[i])
+                while len(self._paper_vectors) > self.PAPER_VECTOR_CACHE_SIZE:
+                    self._paper_vectors.popitem(last=False)
             
-            # 按相似度排序
-            similarities.sort(key=lambda x: x[1], reverse=True)
+            # 向量均已归一化并量化为int8，余弦相似度即一次整数矩阵-向量乘法再乘以两侧缩放系数；
+            # 排序结果与float32基本一致，缓存与参与计算的数据量约为float32的1/4。缺失或维度不符的向量得分为0
+            query_q, query_scale = self._quantize(query_vec)
+            matrix = np.zeros((len(vectors), query_q.size), dtype=np.int8)
+            scales = np.zeros(len(vectors), dtype=np.float32)
+            for i, vector in enumerate(vectors):
+                if vector is not None and vector[0].shape == query_q.shape:
+                    matrix[i], scales[i] = vector
+            # int8乘积转为float32后走BLAS矩阵-向量乘法（numpy的整数矩阵乘法没有BLAS加速）；
+            # 1024维时点积绝对值最大约1.6e7，低于float32可精确表示的整数上限2^24，结果与整数运算完全一致；
+            # 更高维度超出时也只有约1e-7的相对舍入误差，不影响排序
+            scores = (matrix.astype(np.float32) @ query_q.astype(np.float32)) * (scales * query_scale)
             
-            return similarities
+            # 按相似度降序排列：直接对得分数组求排序索引（稳定排序，同分保持检索顺序），不再构造元组后排序
+            order = np.argsort(-scores, kind="stable")
+            return [(related_papers[i], float(scores[i])) for i in order]
         except Exception as e:
             print(f"⚠️  语义相似度计算失败: {e}")
             return [(paper, 0.0) for paper in related_papers]
 
-    def analyze_innovation(self, structured_info: Dict[str, str], related_papers: List[Dict], timeout: Optional[int] = None, language: str = 'en') -> str:
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        """L2归一化为float32向量，空向量或零向量返回None"""
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        if vec.size == 0 or norm == 0:
+            return None
+        return vec / norm
+
+    @staticmethod
+    def _quantize(vec: Optional[np.ndarray]) -> Optional[Tuple[np.ndarray, float]]:
+        """对称量化为int8：缩放系数为 max(|x|)/127，返回 (量化向量, 缩放系数)；输入为None时返回None"""
+        if vec is None:
+            return None
+        scale = float(np.max(np.abs(vec))) / 127.0
+        if scale == 0:
+            return None
+        return np.round(vec / scale).astype(np.int8), scale
+
+    def analyze_innovation(self, structured_info: Dict[str, str], related_papers: List[Dict], timeout: Optional[int] = None, language: str = 'en',
+                           info_text: Optional[str] = None) -> str:
         """
         分析创新点
         
@@ -277,6 +374,7 @@ class PaperAnalyzer:
             related_papers: 相关论文列表
             timeout: 超时时间（秒）
             language: 语言，'zh'表示中文，'en'表示英文
+            info_text: 已格式化的结构化信息（调用方只格式化一次时传入，默认现场格式化）
         
         Returns:
             创新点分析文本
@@ -284,26 +382,79 @@ class PaperAnalyzer:
         timeout = timeout or self.config.SEMANTIC_ANALYSIS_TIMEOUT
         
         try:
-            # 格式化相关信息
-            info_text = self._format_structured_info(structured_info)
-            related_text = self._format_related_papers(related_papers)
-            
-            prompt = get_innovation_analysis_prompt(info_text, related_text, language=language)
-            
-            response = self.llm_client.get_response(
-                prompt,
-                use_reasoning_model=True,  # 使用推理模型进行深度分析
-                temperature=0.5,
-                timeout=timeout
-            )
-            
-            return response
+            # 使用推理模型进行深度分析
+            prompt = self._innovation_prompt(structured_info, related_papers, language, info_text)
+            return self._get_response_cached(prompt, temperature=0.5, timeout=timeout)
         except Exception as e:
-            print(f"⚠️  创新点分析失败: {e}")
-            if language == 'zh':
-                return f"创新点分析失败: {str(e)}"
-            else:
-                return f"Innovation analysis failed: {str(e)}"
+            return self._innovation_failure(e, language)
+
+    async def aanalyze_innovation(self, structured_info: Dict[str, str], related_papers: List[Dict], timeout: Optional[int] = None, language: str = 'en',
+                                  info_text: Optional[str] = None) -> str:
+        """分析创新点（异步版本，LLM调用不占用线程池），参数与返回值同 analyze_innovation"""
+        timeout = timeout or self.config.SEMANTIC_ANALYSIS_TIMEOUT
+        
+        try:
+            prompt = self._innovation_prompt(structured_info, related_papers, language, info_text)
+            return await self._aget_response_cached(prompt, temperature=0.5, timeout=timeout)
+        except Exception as e:
+            return self._innovation_failure(e, language)
+
+    def _innovation_prompt(self, structured_info: Dict[str, str], related_papers: List[Dict], language: str,
+                           info_text: Optional[str]) -> str:
+        """构建创新点分析提示词（同步与异步版本共用）"""
+        info_text = info_text or self._format_structured_info(structured_info)
+        related_text = self._format_related_papers(related_papers)
+        return get_innovation_analysis_prompt(info_text, related_text, language=language)
+
+    @staticmethod
+    def _innovation_failure(error: Exception, language: str) -> str:
+        """创新点分析失败时记录日志，返回对应语言的失败说明"""
+        print(f"⚠️  创新点分析失败: {error}")
+        if language == 'zh':
+            return f"创新点分析失败: {str(error)}"
+        else:
+            return f"Innovation analysis failed: {str(error)}"
+
+    def _response_key(self, prompt: str, temperature: float) -> str:
+        """LLM响应的缓存键：模型名、温度与提示词的SHA-256"""
+        raw = f"{self.config.LLM_REASONING_MODEL}\x00{temperature}\x00{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup_response(self, key: str) -> Optional[str]:
+        """读取缓存的LLM响应，命中时刷新LRU顺序"""
+        with self._response_lock:
+            response = self._llm_responses.get(key)
+            if response is not None:
+                self._llm_responses.move_to_end(key)
+            return response
+
+    def _store_response(self, key: str, response: str):
+        """缓存LLM响应（空响应不缓存），超出容量时淘汰最久未使用的条目"""
+        if not response or not response.strip():
+            return
+        with self._response_lock:
+            self._llm_responses[key] = response
+            self._llm_responses.move_to_end(key)
+            while len(self._llm_responses) > self.LLM_RESPONSE_CACHE_SIZE:
+                self._llm_responses.popitem(last=False)
+
+    def _get_response_cached(self, prompt: str, temperature: float, timeout: Optional[int]) -> str:
+        """调用推理模型，相同提示词与温度直接返回缓存的响应"""
+        key = self._response_key(prompt, temperature)
+        response = self._lookup_response(key)
+        if response is None:
+            response = self.llm_client.get_response(prompt, use_reasoning_model=True, temperature=temperature, timeout=timeout)
+            self._store_response(key, response)
+        return response
+
+    async def _aget_response_cached(self, prompt: str, temperature: float, timeout: Optional[int]) -> str:
+        """_get_response_cached 的异步版本"""
+        key = self._response_key(prompt, temperature)
+        response = self._lookup_response(key)
+        if response is None:
+            response = await self.llm_client.aget_response(prompt, use_reasoning_model=True, temperature=temperature, timeout=timeout)
+            self._store_response(key, response)
+        return response
 
     def _format_structured_info(self, structured_info: Dict[str, str]) -> str:
         """格式化结构化信息为文本，必要时回退到原始文本片段"""
@@ -401,8 +552,11 @@ class PaperAnalyzer:
         }
         
         try:
+            # 结构化信息只格式化一次，关键词提取、语义相似度与创新点分析共用
+            paper_text = self._format_structured_info(structured_info)
+            
             # 1. 提取关键词
-            keywords = self.extract_keywords(structured_info, timeout)
+            keywords = self.extract_keywords(structured_info, timeout, info_text=paper_text)
             result["keywords"] = keywords
             
             # 2. 构建查询
@@ -413,14 +567,14 @@ class PaperAnalyzer:
             related_papers = self.retrieve_related_papers(query, keywords, timeout)
             result["related_papers"] = related_papers
             
-            # 4. 计算语义相似度
-            paper_text = self._format_structured_info(structured_info)
-            semantic_similarities = self.calculate_semantic_similarity(paper_text, related_papers)
-            result["semantic_similarities"] = semantic_similarities
-            
-            # 5. 分析创新点
-            innovation_analysis = self.analyze_innovation(structured_info, related_papers, timeout)
-            result["innovation_analysis"] = innovation_analysis
+            # 4/5. 语义相似度（embedding请求）与创新点分析（LLM调用）互不依赖，并发执行：
+            # 创新点分析提交到线程中，当前线程同时计算相似度
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                innovation_future = executor.submit(
+                    self.analyze_innovation, structured_info, related_papers, timeout, info_text=paper_text
+                )
+                result["semantic_similarities"] = self.calculate_semantic_similarity(paper_text, related_papers)
+                result["innovation_analysis"] = innovation_future.result()
             
         except Exception as e:
             print(f"⚠️  论文分析失败: {e}")
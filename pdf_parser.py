@@ -4,8 +4,7 @@ PDF解析模块 - 处理Base64编码的PDF，提取文本并进行结构化解
 import base64
 import io
 import re
-from typing import Dict, Optional, Tuple
-import pdfplumber
+from typing import Dict, Iterator, Optional, Tuple, Union
 from llm_client import LLMClient
 # 优先从v2版本导入，如果没有则从v1版本导入
 from prompt_template_v2 import get_pdf_parse_prompt
@@ -13,6 +12,109 @@ from prompt_template_v2 import get_pdf_parse_prompt
 from config import Config
 
 
+# 结构化解析送入LLM的最大文本长度；文本提取达到该长度即停止处理后续页面（超出部分反正会被截断）
+MAX_PARSE_TEXT_CHARS = 20000
+
+# LLM结构化输出中的字段名及其别名（包含英文和中文关键词），顺序即匹配优先级
+_SECTION_ALIASES = {
+    "Title": ["Title", "title", "标题"],
+    "Authors": ["Authors", "authors", "Author", "作者"],
+    "Abstract": ["Abstract", "abstract", "摘要"],
+    "Keywords": ["Keywords", "keywords", "Keyword", "关键词"],
+    "Introduction": ["Introduction", "introduction", "引言"],
+    "Methodology": ["Methodology", "methodology", "Method", "Methods", "方法论", "方法"],
+    "Experiments": ["Experiments", "experiments", "Experimental", "Experiment", "实验"],
+    "Results": ["Results", "results", "Result", "结果"],
+    "Conclusion": ["Conclusion", "conclusions", "Conclusions", "结论"],
+    "References": ["References", "references", "Reference", "参考文献"],
+    "Paper Type": ["Paper Type", "paper type", "Type", "论文类型", "类型"],
+    "Core Contributions": ["Core Contributions", "contributions", "Contributions", "核心贡献", "贡献"],
+    "Technical Approach": ["Technical Approach", "technical approach", "Approach", "技术方法", "技术 approach"]
+}
+
+# 别名（小写）-> 字段名；多个字段含相同别名时以先出现的为准
+def _build_alias_map() -> Dict[str, str]:
+    alias_map = {}
+    for section, aliases in _SECTION_ALIASES.items():
+        for alias in aliases:
+            alias_map.setdefault(alias.lower(), section)
+    return alias_map
+
+
+_ALIAS_TO_SECTION = _build_alias_map()
+
+# 行首为某个关键词，且其后为行尾、空格或（可隔空白的）冒号；交替分支按顺序尝试，与逐个关键词匹配的优先级一致
+_SECTION_RE = re.compile(
+    r'^(' + '|'.join(re.escape(alias) for aliases in _SECTION_ALIASES.values() for alias in aliases) + r')(?=$| |\s*[：:])',
+    re.IGNORECASE
+)
+
+# 行标准化：开头的编号（1. 2. 3.）、Markdown加粗、标题标记
+_NUMBERING_RE = re.compile(r'^\d+\.\s*')
+_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_HEADING_RE = re.compile(r'^#+\s*')
+
+# 第一个冒号之后的内容
+_COLON_CONTENT_RE = re.compile(r'[：:]\s*(.*)$')
+
+
+def _iter_page_texts(pdf_bytes: bytes) -> Iterator[str]:
+    """
+    逐页产出PDF文本（调用方提前停止迭代时不再处理后续页面）
+    
+    优先使用PyMuPDF（C实现的MuPDF，比纯Python的pdfminer快一个数量级），未安装时回退到pdfplumber。
+    两者都只在首次实际提取时导入。
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        pymupdf = None
+    
+    if pymupdf is not None:
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            for page in doc:
+                # 与pdfplumber的输出保持一致：去掉页尾换行
+                yield page.get_text("text").rstrip()
+        return
+    
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text()
+
+
+def extract_pdf_text(pdf_bytes: bytes, max_chars: Optional[int] = None) -> str:
+    """
+    从PDF中提取文本（纯CPU计算，模块级函数便于提交到进程池执行）
+    
+    Args:
+        pdf_bytes: PDF二进制数据
+        max_chars: 提取到的字符数达到该值后不再处理后续页面（None表示提取全部页面）
+    
+    Returns:
+        提取的文本内容
+    """
+    try:
+        text_parts = []
+        total_chars = 0
+        
+        for page_text in _iter_page_texts(pdf_bytes):
+            if page_text:
+                text_parts.append(page_text)
+                total_chars += len(page_text)
+                if max_chars is not None and total_chars >= max_chars:
+                    break
+        
+        full_text = "\n\n".join(text_parts)
+        
+        if not full_text or len(full_text.strip()) < 100:
+            raise ValueError("PDF文本提取失败或内容过少")
+        
+        return full_text
+    except Exception as e:
+        raise ValueError(f"PDF文本提取失败: {e}")
+
+
 class PDFParser:
     """PDF解析器"""
 
@@ -48,34 +150,18 @@ class PDFParser:
         except Exception as e:
             raise ValueError(f"Base64解码失败: {e}")
 
-    def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
+    def extract_text_from_pdf(self, pdf_bytes: bytes, max_chars: Optional[int] = None) -> str:
         """
         从PDF中提取文本
         
         Args:
             pdf_bytes: PDF二进制数据
+            max_chars: 提取到的字符数达到该值后不再处理后续页面（None表示提取全部页面）
         
         Returns:
             提取的文本内容
         """
-        try:
-            pdf_file = io.BytesIO(pdf_bytes)
-            text_parts = []
-            
-            with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-            
-            full_text = "\n\n".join(text_parts)
-            
-            if not full_text or len(full_text.strip()) < 100:
-                raise ValueError("PDF文本提取失败或内容过少")
-            
-            return full_text
-        except Exception as e:
-            raise ValueError(f"PDF文本提取失败: {e}")
+        return extract_pdf_text(pdf_bytes, max_chars)
 
     def parse_pdf_structure(self, pdf_text: str, timeout: Optional[int] = None, language: str = 'en') -> Dict[str, str]:
         """
@@ -93,9 +179,8 @@ class PDFParser:
         
         try:
             # 限制文本长度，避免超出token限制
-            max_text_length = 20000
-            if len(pdf_text) > max_text_length:
-                pdf_text = pdf_text[:max_text_length] + "\n\n[Text truncated due to length...]"
+            if len(pdf_text) > MAX_PARSE_TEXT_CHARS:
+                pdf_text = pdf_text[:MAX_PARSE_TEXT_CHARS] + "\n\n[Text truncated due to length...]"
             
             prompt = get_pdf_parse_prompt(pdf_text, language=language)
             
@@ -132,71 +217,27 @@ class PDFParser:
             "raw_response": response
         }
         
-        # 尝试提取各个字段，包含英文和中文关键词
-        sections = {
-            "Title": ["Title", "title", "标题"],
-            "Authors": ["Authors", "authors", "Author", "作者"],
-            "Abstract": ["Abstract", "abstract", "摘要"],
-            "Keywords": ["Keywords", "keywords", "Keyword", "关键词"],
-            "Introduction": ["Introduction", "introduction", "引言"],
-            "Methodology": ["Methodology", "methodology", "Method", "Methods", "方法论", "方法"],
-            "Experiments": ["Experiments", "experiments", "Experimental", "Experiment", "实验"],
-            "Results": ["Results", "results", "Result", "结果"],
-            "Conclusion": ["Conclusion", "conclusions", "Conclusions", "结论"],
-            "References": ["References", "references", "Reference", "参考文献"],
-            "Paper Type": ["Paper Type", "paper type", "Type", "论文类型", "类型"],
-            "Core Contributions": ["Core Contributions", "contributions", "Contributions", "核心贡献", "贡献"],
-            "Technical Approach": ["Technical Approach", "technical approach", "Approach", "技术方法", "技术 approach"]
-        }
-        
         lines = response.split('\n')
         current_section = None
         current_content = []
         matched_sections = []  # 用于debug：记录匹配到的section
         
-        def normalize_line(line: str) -> str:
-            """标准化行：去除编号、Markdown格式等"""
-            # 去除开头的编号格式：1. 2. 3. 等
-            line = re.sub(r'^\d+\.\s*', '', line)
-            # 去除Markdown加粗：**text** -> text
-            line = re.sub(r'\*\*([^*]+)\*\*', r'\1', line)
-            # 去除其他Markdown格式
-            line = re.sub(r'^#+\s*', '', line)  # 去除标题标记
-            return line.strip()
-        
         def match_section(line: str) -> Tuple[Optional[str], str]:
             """
             尝试匹配section，返回 (section_name, remaining_content)
             如果匹配失败，返回 (None, None)
             """
-            normalized = normalize_line(line)
-            
-            # 尝试匹配各个section
-            for section_name, keywords in sections.items():
-                for keyword in keywords:
-                    # 检查是否以关键词开头（可能跟着冒号、破折号等）
-                    # 使用不区分大小写的匹配
-                    pattern = rf'^{re.escape(keyword)}\s*[：:]\s*(.*)$'
-                    match = re.match(pattern, normalized, re.IGNORECASE)
-                    if match:
-                        return section_name, match.group(1).strip()
-                    
-                    # 也检查是否只包含关键词（后面可能换行）
-                    # 使用不区分大小写的比较
-                    keyword_lower = keyword.lower()
-                    normalized_lower = normalized.lower()
-                    if (normalized_lower == keyword_lower or 
-                        normalized_lower.startswith(keyword_lower + ' ') or 
-                        normalized_lower.startswith(keyword_lower + '：') or 
-                        normalized_lower.startswith(keyword_lower + ':')):
-                        # 从normalized中提取冒号后的内容
-                        colon_match = re.search(r'[：:]\s*(.*)$', normalized)
-                        if colon_match:
-                            return section_name, colon_match.group(1).strip()
-                        # 如果没有冒号，返回空内容（内容可能在下一行）
-                        return section_name, ""
+            # 标准化行：去除编号、Markdown格式等
+            normalized = _HEADING_RE.sub('', _BOLD_RE.sub(r'\1', _NUMBERING_RE.sub('', line, count=1)), count=1).strip()
             
-            return None, None
+            # 所有关键词合并为一个交替正则，一次匹配即可确定section（按原有的section与关键词顺序优先）
+            match = _SECTION_RE.match(normalized)
+            if not match:
+                return None, None
+            section_name = _ALIAS_TO_SECTION[match.group(1).lower()]
+            # 提取冒号后的内容；没有冒号时返回空内容（内容可能在下一行）
+            colon_match = _COLON_CONTENT_RE.search(normalized)
+            return section_name, colon_match.group(1).strip() if colon_match else ""
         
         for line in lines:
             line_stripped = line.strip()
@@ -270,12 +311,12 @@ class PDFParser:
         
         return structured_info
 
-    def parse(self, base64_pdf: str, timeout: Optional[int] = None, language: str = 'en') -> Dict[str, str]:
+    def parse(self, base64_pdf: Union[str, bytes], timeout: Optional[int] = None, language: str = 'en') -> Dict[str, str]:
         """
         完整的PDF解析流程
         
         Args:
-            base64_pdf: Base64编码的PDF字符串
+            base64_pdf: Base64编码的PDF字符串，或已解码的PDF二进制数据
             timeout: 超时时间（秒）
             language: 语言，'zh'表示中文，'en'表示英文
         
@@ -283,19 +324,17 @@ class PDFParser:
             结构化的论文信息字典
         """
         try:
-            # 1. 解码Base64
-            pdf_bytes = self.decode_base64_pdf(base64_pdf)
+            # 1. 解码Base64（调用方已解码时直接使用）
+            if isinstance(base64_pdf, bytes):
+                pdf_bytes = base64_pdf
+            else:
+                pdf_bytes = self.decode_base64_pdf(base64_pdf)
             
-            # 2. 提取文本
-            pdf_text = self.extract_text_from_pdf(pdf_bytes)
+            # 2. 提取文本（够结构化解析使用即停止，长论文不再处理后续页面）
+            pdf_text = self.extract_text_from_pdf(pdf_bytes, MAX_PARSE_TEXT_CHARS)
             
             # 3. 结构化解析
-            structured_info = self.parse_pdf_structure(pdf_text, timeout, language=language)
-            
-            # 添加原始文本（截断）
-            structured_info["raw_text"] = pdf_text[:10000]  # 保留前10000字符
-            
-            return structured_info
+            return self.parse_text(pdf_text, timeout, language)
         except Exception as e:
             # 返回错误信息，但不中断流程
             return {
@@ -303,3 +342,21 @@ class PDFParser:
                 "raw_text": ""
             }
 
+    def parse_text(self, pdf_text: str, timeout: Optional[int] = None, language: str = 'en') -> Dict[str, str]:
+        """
+        对已提取的PDF文本做结构化解析（文本提取可由调用方放到进程池中完成）
+        
+        Args:
+            pdf_text: PDF文本内容
+            timeout: 超时时间（秒）
+            language: 语言，'zh'表示中文，'en'表示英文
+        
+        Returns:
+            结构化的论文信息字典
+        """
+        structured_info = self.parse_pdf_structure(pdf_text, timeout, language=language)
+        
+        # 添加原始文本（截断）
+        structured_info["raw_text"] = pdf_text[:10000]  # 保留前10000字符
+        
+        return structured_info
@@ -2,6 +2,7 @@
 Prompt模板 - 用于论文评阅系统的各个阶段
 """
 import re
+from functools import lru_cache
 
 
 def detect_language(text: str) -> str:
@@ -24,6 +25,22 @@ def detect_language(text: str) -> str:
         return 'en'
 
 
+# 参与缓存的最大文本长度，更长的文本直接检测，避免缓存持有大字符串
+_LANGUAGE_CACHE_MAX_CHARS = 4096
+
+
+@lru_cache(maxsize=1024)
+def _detect_language_cached(text: str) -> str:
+    return detect_language(text)
+
+
+def cached_detect_language(text: str) -> str:
+    """带LRU缓存的语言检测，重复提交的相同query直接命中缓存"""
+    if not text or len(text) > _LANGUAGE_CACHE_MAX_CHARS:
+        return detect_language(text)
+    return _detect_language_cached(text)
+
+
 def get_pdf_parse_prompt(pdf_text: str, language: str = 'en') -> str:
     """PDF结构化解析Prompt"""
     if language == 'zh':
@@ -3,6 +3,7 @@ Prompt模板 V2 - 基于大模型能力的论文评阅系统（不涉及文件
 高质量、详细的 prompt 设计，确保模型输出准确无误的评阅结果
 """
 import re
+from functools import lru_cache
 
 
 def detect_language(text: str) -> str:
@@ -25,6 +26,22 @@ def detect_language(text: str) -> str:
         return 'en'
 
 
+# 参与缓存的最大文本长度，更长的文本直接检测，避免缓存持有大字符串
+_LANGUAGE_CACHE_MAX_CHARS = 4096
+
+
+@lru_cache(maxsize=1024)
+def _detect_language_cached(text: str) -> str:
+    return detect_language(text)
+
+
+def cached_detect_language(text: str) -> str:
+    """带LRU缓存的语言检测，重复提交的相同query直接命中缓存"""
+    if not text or len(text) > _LANGUAGE_CACHE_MAX_CHARS:
+        return detect_language(text)
+    return _detect_language_cached(text)
+
+
 def get_pdf_parse_prompt(pdf_text: str, language: str = 'en') -> str:
     """PDF结构化解析Prompt（V1和V2共用）"""
     if language == 'zh':
@@ -243,12 +260,17 @@ Please provide your analysis in English."""
     return prompt
 
 
-def get_evaluation_prompt_v2(structured_info: str, innovation_analysis: str, language: str = 'en') -> str:
+def get_evaluation_prompt_v2(structured_info: str, innovation_analysis: str = "", language: str = 'en') -> str:
     """
     多维度评估Prompt V2 - 基于论文内容本身进行深度评估
     不依赖外部论文检索，完全基于论文自身内容进行评估
+    innovation_analysis 为空时（与创新点分析并行执行）省略创新点分析段落
     """
     if language == 'zh':
+        innovation_section = f"""
+创新点分析：
+{innovation_analysis[:3000]}
+""" if innovation_analysis else ""
         prompt = f"""你是一位资深的学术评阅专家，具有丰富的论文评阅经验和深厚的学术背景。请基于论文内容本身，从多个维度深入评估以下论文。
 
 **重要原则**：
@@ -259,10 +281,7 @@ def get_evaluation_prompt_v2(structured_info: str, innovation_analysis: str, lan
 
 论文结构化信息：
 {structured_info[:8000]}
-
-创新点分析：
-{innovation_analysis[:3000]}
-
+{innovation_section}
 请从以下维度进行详细评估，**每个维度都必须提供深入、具体的分析，避免泛泛而谈**：
 
 ## 1. 技术质量（Technical Quality）
@@ -396,6 +415,10 @@ def get_evaluation_prompt_v2(structured_info: str, innovation_analysis: str, lan
 
 请使用中文回答。所有输出内容都必须是中文。"""
     else:
+        innovation_section = f"""
+Innovation Analysis:
+{innovation_analysis[:3000]}
+""" if innovation_analysis else ""
         prompt = f"""You are a senior academic review expert with rich experience in paper reviewing and deep academic background. Please deeply evaluate the following paper from multiple dimensions based solely on the paper content itself.
 
 **Key Principles**:
@@ -406,10 +429,7 @@ def get_evaluation_prompt_v2(structured_info: str, innovation_analysis: str, lan
 
 Structured Paper Information:
 {structured_info[:8000]}
-
-Innovation Analysis:
-{innovation_analysis[:3000]}
-
+{innovation_section}
 Please conduct detailed evaluation from the following dimensions. **Each dimension must provide in-depth, specific analysis, avoiding generalizations**:
 
 ## 1. Technical Quality
@@ -3,17 +3,24 @@ import time
 import numpy as np
 from typing import List, Dict, Optional
 from config import Config
-from embedding_client import EmbeddingClient
+from embedding_client import EmbeddingClient, get_embedding_client
 
 
 class PaperRetriever:
     """论文检索器 - 基于Semantic Scholar API，失败时fallback到OpenAlex"""
 
-    def __init__(self):
+    def __init__(self, embedding_client: Optional[EmbeddingClient] = None):
+        """
+        初始化论文检索器
+        
+        Args:
+            embedding_client: 共享的Embedding客户端，未提供时自行创建
+        """
         self.config = Config
-        self.embedding_client = None
+        self.embedding_client = embedding_client
         print("🔄 正在初始化论文检索器...")
-        self._init_embedding_client()
+        if self.embedding_client is None:
+            self._init_embedding_client()
         # OpenAlex API headers（建议包含邮箱，但非必需）
         self.openalex_headers = {
             'User-Agent': 'ICAIS2025-PaperReview/1.0 ( https://github.com/your-repo )'
@@ -24,7 +31,7 @@ class PaperRetriever:
         """初始化embedding客户端"""
         try:
             print(f"🔄 正在初始化Embedding客户端: {self.config.EMBEDDING_MODEL_NAME}...")
-            self.embedding_client = EmbeddingClient()
+            self.embedding_client = get_embedding_client()
             print(f"✅ Embedding客户端初始化成功")
         except Exception as e:
             print(f"⚠️  Embedding客户端初始化失败: {e}，将跳过语义重排序")
@@ -423,8 +430,11 @@ class PaperRetriever:
 
         return all_papers
 
-    def rerank_by_similarity(self, papers: List[Dict], background_embedding: np.ndarray, background_text: str) -> List[Dict]:
-        """基于语义相似度重排序论文"""
+    def rerank_by_similarity(self, papers: List[Dict], background_embedding: Optional[np.ndarray], background_text: str) -> List[Dict]:
+        """基于语义相似度重排序论文
+
+        background_embedding 为None时，背景文本与论文文本在同一次embedding请求中获取。
+        """
         if not self.embedding_client or len(papers) == 0:
             return papers
 
@@ -436,17 +446,24 @@ class PaperRetriever:
                 text = f"{title} {abstract}".strip()
                 paper_texts.append(text if text else " ")
 
-            paper_embeddings = self.embedding_client.encode(paper_texts, show_progress_bar=False)
+            if background_embedding is None:
+                if not background_text or not background_text.strip():
+                    return papers
+                embeddings = self.embedding_client.encode([background_text] + paper_texts, show_progress_bar=False)
+                background_embedding, paper_embeddings = embeddings[0], embeddings[1:]
+                if not np.any(background_embedding):
+                    return papers
+            else:
+                paper_embeddings = self.embedding_client.encode(paper_texts, show_progress_bar=False)
             
             if paper_embeddings.ndim == 1:
                 paper_embeddings = paper_embeddings.reshape(1, -1)
 
-            similarities = []
-            for paper_emb in paper_embeddings:
-                similarity = np.dot(background_embedding, paper_emb) / (
-                    np.linalg.norm(background_embedding) * np.linalg.norm(paper_emb) + 1e-8
-                )
-                similarities.append(similarity)
+            # 向量化计算余弦相似度：一次矩阵-向量乘法代替逐篇循环
+            query_vec = np.asarray(background_embedding, dtype=np.float32)
+            query_vec = query_vec / (np.linalg.norm(query_vec) + 1e-8)
+            paper_norms = np.linalg.norm(paper_embeddings, axis=1)
+            similarities = ((paper_embeddings @ query_vec) / (paper_norms + 1e-8)).tolist()
 
             sorted_papers = sorted(
                 zip(papers, similarities),
@@ -507,9 +524,8 @@ class PaperRetriever:
 
         if self.embedding_client:
             try:
-                background_embedding = self.embedding_client.encode(query_text, show_progress_bar=False)
-                if background_embedding is not None and len(background_embedding) > 0:
-                    all_papers = self.rerank_by_similarity(all_papers, background_embedding, query_text)
+                # 查询文本与候选论文一起批量获取embedding，只发起一次API请求
+                all_papers = self.rerank_by_similarity(all_papers, None, query_text)
             except Exception as e:
                 print(f"⚠️  语义重排序失败: {e}，使用原始顺序")
 
@@ -0,0 +1,332 @@
+"""
+评阅缓存模块 - 对重复或近似重复提交的论文复用已生成的评阅报告、中间阶段结果及文本embedding
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+import numpy as np
+
+
+# 落盘缓存每写入多少次检查一次磁盘占用（进程内首次写入时也会检查，清理上次运行遗留的文件）
+_PRUNE_EVERY = 16
+
+
+def _prune_files(root: str, suffix: str, max_files: int, ttl: Optional[float] = None):
+    """
+    清理落盘缓存目录：删除超过 ttl 秒未修改的文件，剩余文件数超过 max_files 时按修改时间删除最旧的
+
+    Args:
+        root: 缓存目录（递归扫描）
+        suffix: 缓存文件后缀
+        max_files: 最多保留的文件数，<=0 表示不限制
+        ttl: 文件存活时间（秒），None或<=0表示不过期
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+
+    expired = []
+    if ttl and ttl > 0:
+        cutoff = time.time() - ttl
+        expired = [path for mtime, path in files if mtime < cutoff]
+        files = [(mtime, path) for mtime, path in files if mtime >= cutoff]
+    if max_files > 0 and len(files) > max_files:
+        files.sort()
+        expired.extend(path for _, path in files[:len(files) - max_files])
+
+    for path in expired:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ReviewCache:
+    """评阅结果缓存（TTL + LRU淘汰）
+
+    - 精确匹配：以 query + pdf_content 的 SHA-256 为键
+    - 语义匹配：以 Title+Abstract 的归一化embedding做内积检索，超过阈值即视为命中
+    """
+
+    def __init__(self, ttl: int = 300, max_entries: int = 128, similarity_threshold: float = 0.87):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 条目存活时间（秒）
+            max_entries: 最大条目数，超出后淘汰最久未使用的条目
+            similarity_threshold: 语义命中的余弦相似度阈值
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # key -> (过期时间, 评阅报告, 归一化embedding或None, 语言)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, pdf_content: str, language: str = 'en') -> str:
+        """生成精确匹配的缓存键"""
+        digest = hashlib.sha256()
+        for part in (language, query, pdf_content):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """精确匹配查询，未命中或已过期返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def get_similar(self, embedding: np.ndarray, language: str = 'en') -> Optional[str]:
+        """
+        语义匹配查询
+
+        Args:
+            embedding: 待查询论文 Title+Abstract 的embedding
+            language: 评阅语言，仅匹配同语言的缓存条目
+
+        Returns:
+            相似度最高且超过阈值的评阅报告，未命中返回None
+        """
+        query_vec = self._normalize(embedding)
+        if query_vec is None:
+            return None
+
+        with self._lock:
+            self._evict_expired()
+            keys = [key for key, entry in self._entries.items() if entry[2] is not None and entry[3] == language]
+            if not keys:
+                return None
+            matrix = np.stack([self._entries[key][2] for key in keys])
+            if matrix.shape[1] != query_vec.shape[0]:
+                return None
+            scores = matrix @ query_vec
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            return self._entries[keys[best]][1]
+
+    def put(self, key: str, review: str, embedding: Optional[np.ndarray] = None, language: str = 'en'):
+        """写入缓存条目，embedding为空时只参与精确匹配"""
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, review, self._normalize(embedding), language)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_expired(self):
+        """清理过期条目（调用方持有锁）"""
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if entry[0] < now]
+        for key in expired:
+            del self._entries[key]
+
+    @staticmethod
+    def _normalize(embedding: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """L2归一化，空向量或零向量返回None"""
+        if embedding is None:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        if vec.size == 0 or norm == 0:
+            return None
+        return vec / norm
+
+
+class StageCache:
+    """阶段结果缓存（PDF结构化解析、关键词等）
+
+    以 pdf_content 的 SHA-256 为基础键，内存中保留有限条目（LRU），
+    同时落盘为 {cache_dir}/{key}.json，供其他worker进程复用。
+    落盘文件包含论文原文片段：超过 ttl 的文件读取时视为未命中，写入时定期删除过期文件，
+    并将文件数限制在 max_files 以内。
+    """
+
+    def __init__(self, cache_dir: str = "/tmp/review_cache", max_entries: int = 256,
+                 ttl: int = 86400, max_files: int = 1024):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 落盘目录，为空时只使用内存缓存
+            max_entries: 内存中的最大条目数
+            ttl: 落盘文件的存活时间（秒），<=0 表示不过期
+            max_files: 磁盘上最多保留的条目文件数，<=0 表示不限制
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_files = max_files
+        self._writes = 0
+        # key -> {阶段名: 结果}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(pdf_content: str, language: str = 'en', model: str = '') -> str:
+        """生成缓存键，模型名参与计算，切换模型后旧结果自动失效"""
+        pdf_hash = hashlib.sha256(pdf_content.encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{pdf_hash}:{language}:{model}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str, stage: str) -> Optional[Any]:
+        """读取某个阶段的缓存结果，未命中返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.get(stage)
+
+        entry = self._load(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._remember(key, entry)
+        return entry.get(stage)
+
+    def put(self, key: str, stage: str, value: Any):
+        """写入某个阶段的结果（同时更新内存与磁盘）"""
+        with self._lock:
+            entry = dict(self._entries.get(key) or self._load(key) or {})
+            entry[stage] = value
+            self._remember(key, entry)
+        self._dump(key, entry)
+
+    def _remember(self, key: str, entry: dict):
+        """写入内存并按LRU淘汰（调用方持有锁）"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[dict]:
+        """从磁盘读取缓存条目，不存在或损坏时返回None"""
+        path = self._path(key)
+        if not path:
+            return None
+        try:
+            if self.ttl > 0 and os.path.getmtime(path) < time.time() - self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  读取阶段缓存失败: {e}")
+            return None
+
+    def _dump(self, key: str, entry: dict):
+        """原子写入磁盘（先写临时文件再替换），失败不影响主流程"""
+        path = self._path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️  写入阶段缓存失败: {e}")
+            return
+
+        with self._lock:
+            prune = self._writes % _PRUNE_EVERY == 0
+            self._writes += 1
+        if prune:
+            _prune_files(self.cache_dir, ".json", self.max_files, self.ttl)
+
+
+class EmbeddingCache:
+    """Embedding磁盘缓存
+
+    以 (模型, 文本) 为键，每条向量按float32原始字节落盘为
+    {cache_dir}/{模型}/{哈希前2位}/{哈希}.bin，可在多次运行与多个worker进程间复用。
+    命中时刷新文件修改时间，写入时定期按修改时间淘汰最久未使用的文件，条目数限制在 max_entries 以内。
+    """
+
+    # 每写入多少条检查一次磁盘占用（扫描整个模型目录，条目较多，间隔大于阶段缓存）
+    PRUNE_EVERY = 256
+
+    def __init__(self, cache_dir: str, model: str, max_entries: int = 20000):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存根目录（支持 ~ 展开）
+            model: 嵌入模型名称，不同模型的向量互不复用
+            max_entries: 磁盘上最多保留的向量条数，<=0 表示不限制
+        """
+        self.cache_dir = os.path.join(os.path.expanduser(cache_dir), model.replace('/', '_'))
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """生成缓存键"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """读取文本的embedding，未命中或读取失败返回None"""
+        path = self._path(self.make_key(text))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 刷新修改时间，淘汰时按最近使用保留
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  读取Embedding缓存失败: {e}")
+            return None
+        if not data or len(data) % 4:
+            return None
+        return np.frombuffer(data, dtype=np.float32)
+
+    def put(self, text: str, embedding) -> None:
+        """写入文本的embedding（原子替换），失败不影响主流程"""
+        path = self._path(self.make_key(text))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(np.asarray(embedding, dtype=np.float32).tobytes())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️  写入Embedding缓存失败: {e}")
+            return
+
+        with self._lock:
+            prune = self._writes % self.PRUNE_EVERY == 0
+            self._writes += 1
+        if prune:
+            _prune_files(self.cache_dir, ".bin", self.max_entries)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
@@ -2,8 +2,9 @@
 评阅生成模块 V2 - 基于大模型能力的论文评阅系统（不涉及文件检索）
 多维度评估、评阅报告生成
 """
+import re
 import time
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, Optional
 from llm_client import LLMClient
 from prompt_template_v2 import (
     get_innovation_analysis_prompt_v2,
@@ -13,6 +14,10 @@ from prompt_template_v2 import (
 from config import Config
 
 
+# 可重试的服务端错误（502/503、网关错误、超时），单次扫描完成匹配，无需构造小写副本
+_RETRYABLE_ERROR_RE = re.compile(r"502|503|Bad Gateway|Service Unavailable|(?i:timeout)")
+
+
 class ReviewerV2:
     """论文评阅器 V2 - 基于大模型能力，不涉及文件检索"""
 
@@ -68,7 +73,7 @@ class ReviewerV2:
         
         Args:
             structured_info: 结构化的论文信息
-            innovation_analysis: 创新点分析结果
+            innovation_analysis: 创新点分析结果，为空字符串时不依赖创新点分析（可与其并行执行）
             timeout: 超时时间（秒）
             language: 语言，'zh'表示中文，'en'表示英文
         
@@ -119,43 +124,78 @@ class ReviewerV2:
         info_text = self._format_structured_info(structured_info)
         prompt = get_review_generation_prompt_v2(info_text, evaluation, innovation_analysis, language=language)
         
-        # 重试机制：最多重试3次，针对502/503错误
+        # 使用推理模型生成评阅报告（一次性返回完整内容）
+        def fetch() -> Iterable[str]:
+            return [self.llm_client.get_response(prompt, use_reasoning_model=True, temperature=0.5, timeout=timeout)]
+        
+        return "".join(self._generate_with_retry(fetch, structured_info, evaluation, innovation_analysis, language))
+
+    def generate_review_stream(self, structured_info: Dict[str, str], evaluation: str, innovation_analysis: str, timeout: Optional[int] = None, language: str = 'en') -> Iterator[str]:
+        """
+        流式生成评阅报告（带重试机制），逐段返回LLM输出
+        
+        与 generate_review 共用重试/fallback策略，但只能在尚未输出任何内容时重试；
+        输出开始后发生的错误直接抛出。
+        
+        Args:
+            structured_info: 结构化的论文信息
+            evaluation: 评估结果
+            innovation_analysis: 创新点分析结果
+            timeout: 超时时间（秒）
+            language: 语言，'zh'表示中文，'en'表示英文
+        
+        Yields:
+            Markdown格式评阅报告的增量片段
+        """
+        timeout = timeout or self.config.REPORT_GENERATION_TIMEOUT
+        
+        # 格式化相关信息
+        info_text = self._format_structured_info(structured_info)
+        prompt = get_review_generation_prompt_v2(info_text, evaluation, innovation_analysis, language=language)
+        
+        # 使用推理模型流式生成评阅报告
+        def fetch() -> Iterable[str]:
+            return self.llm_client.stream_response(prompt, use_reasoning_model=True, temperature=0.5, timeout=timeout)
+        
+        yield from self._generate_with_retry(fetch, structured_info, evaluation, innovation_analysis, language)
+
+    def _generate_with_retry(self, fetch: Callable[[], Iterable[str]], structured_info: Dict[str, str], evaluation: str,
+                             innovation_analysis: str, language: str) -> Iterator[str]:
+        """
+        评阅报告生成的重试机制：最多重试3次，针对502/503错误；返回空内容也视为失败
+        
+        每次尝试调用 fetch() 获取LLM输出片段（非流式调用只有一段），尚未输出任何内容时才重试，
+        输出开始后发生的错误直接抛出；重试耗尽时输出备用评阅报告。
+        """
         max_retries = 3
         retry_delays = [2, 4, 8]  # 指数退避：2秒、4秒、8秒
         
         for attempt in range(max_retries):
+            started = False
             try:
-                # 使用推理模型生成评阅报告
-                response = self.llm_client.get_response(
-                    prompt,
-                    use_reasoning_model=True,
-                    temperature=0.5,
-                    timeout=timeout
-                )
-                
-                # 如果成功，返回结果
-                if response and response.strip():
-                    return response
-                else:
-                    # 如果返回空内容，也视为失败，继续重试
-                    if attempt < max_retries - 1:
-                        if language == 'zh':
-                            print(f"⚠️  评阅报告生成返回空内容，{retry_delays[attempt]}秒后重试... (尝试 {attempt + 1}/{max_retries})")
-                        else:
-                            print(f"⚠️  Review generation returned empty content, retrying in {retry_delays[attempt]} seconds... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(retry_delays[attempt])
+                for piece in fetch():
+                    if not started and not piece.strip():
                         continue
+                    started = True
+                    yield piece
+                
+                if started:
+                    return
+                # 如果返回空内容，也视为失败，继续重试
+                if attempt < max_retries - 1:
+                    if language == 'zh':
+                        print(f"⚠️  评阅报告生成返回空内容，{retry_delays[attempt]}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+                    else:
+                        print(f"⚠️  Review generation returned empty content, retrying in {retry_delays[attempt]} seconds... (attempt {attempt + 1}/{max_retries})")
+                    time.sleep(retry_delays[attempt])
+                    continue
                     
             except Exception as e:
-                error_str = str(e)
+                if started:
+                    # 已输出部分内容，无法重试
+                    raise
                 # 检查是否是502/503错误（服务器错误，可以重试）
-                is_retryable = (
-                    "502" in error_str or 
-                    "503" in error_str or 
-                    "Bad Gateway" in error_str or
-                    "Service Unavailable" in error_str or
-                    "timeout" in error_str.lower()
-                )
+                is_retryable = _RETRYABLE_ERROR_RE.search(str(e)) is not None
                 
                 if is_retryable and attempt < max_retries - 1:
                     if language == 'zh':
@@ -168,12 +208,11 @@ class ReviewerV2:
                     # 不可重试的错误或已达到最大重试次数
                     print(f"⚠️  评阅报告生成失败: {e}")
                     if attempt == max_retries - 1:
-                        # 最后一次尝试失败，使用fallback
-                        return self._generate_fallback_review(structured_info, evaluation, innovation_analysis, language=language)
+                        break
                     raise
         
         # 所有重试都失败，使用fallback
-        return self._generate_fallback_review(structured_info, evaluation, innovation_analysis, language=language)
+        yield self._generate_fallback_review(structured_info, evaluation, innovation_analysis, language=language)
 
     def review(self, structured_info: Dict[str, str], timeout: Optional[int] = None, language: str = 'en') -> str:
         """